@@ -0,0 +1,100 @@
+# bench/bench_flavors.py — Geschmacks-Vorschläge: vektorisierter Top-k vs. Python-Schleife über 50k Rezepte
+#
+#   python bench/bench_flavors.py                      # 50k synthetische Rezepte, 200 Anfragen
+#   python bench/bench_flavors.py --recipes 200000 --queries 50 --k 10
+#
+# Baut einen FlavorIndex über zufällige Rezepte (Zutaten aus den Geschmacksklassen plus neutrale, Tags, Editionen)
+# und vergleicht pro Anfrage (Editionsprofil oder Zutatenliste, mit/ohne bevorzugte Edition) das Ergebnis von
+# top_k mit einer reinen Python-Referenz über dieselbe Matrix: jeder Platz muss denselben Score haben (float32-
+# Toleranz, bei Gleichstand ist jede Reihenfolge der Gleichen korrekt). Vorher: die Klassiker-Reihenfolge je
+# Edition (rank_classics, reines Python beim Import) muss der von top_k über die Klassiker entsprechen.
+# Exit-Code 1 bei der ersten Abweichung.
+
+from __future__ import annotations
+import os, sys, time, random, argparse
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QUERY_LOG_ENABLED", "0")
+import server  # noqa: E402
+
+NEUTRAL = ["Gin","Eis","Wermut","Eiweiß","Gurkenwasser","Salz","Pfeffer","Kaffee","Sahne","Ingwer"]
+FLAVORED = server.CITRUS + server.SWEET + server.BITTER + server.HERBS + server.BUBBLY + server.FRUITY
+TAGS = list(server.TAG_FLAVORS) + ["leicht","stark","sommer"]
+
+def synth_recipes(rng: random.Random, n: int) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        ings = [f"{rng.choice([10, 15, 20, 30, 50])} ml {rng.choice(FLAVORED).title()}" for _ in range(rng.randint(1, 4))]
+        ings += rng.sample(NEUTRAL, rng.randint(0, 3))
+        out.append({"name": f"Rezept {i}", "ingredients": ings, "tags": rng.sample(TAGS, rng.randint(0, 2)),
+                    "gins": rng.sample(server.CATS, rng.randint(0, 2)), "instructions": "…"})
+    return out
+
+def top_k_ref(rows: List[List[float]], mask: List[List[bool]], vec: List[float], k: int, prefer: Optional[str]) -> List[float]:
+    # Scores der besten k, reine Python-Schleife über die Zeilen der Matrix
+    col = server.EDITION_ROW.get(prefer)
+    scores = []
+    for i, row in enumerate(rows):
+        s = sum(a * b for a, b in zip(row, vec))
+        if col is not None and mask[i][col]: s += server.PREFER_BONUS
+        scores.append((s, i))
+    scores.sort(key=lambda t: (-t[0], t[1]))
+    return [s for s, _ in scores[:k]]
+
+def check_classics() -> bool:
+    index = server.FlavorIndex(None, server.CLASSICS)
+    vecs = server.edition_vectors()
+    want = {c: [server.CLASSICS.index(r) for r in index.top_k(vecs[server.EDITION_ROW[c]], 4, c)] for c in server.CATS}
+    got = server.rank_classics()
+    if got != want: print(f"ABWEICHUNG Klassiker: rank_classics {got}, top_k {want}")
+    return got == want
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipes", type=int, default=50_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    if not check_classics(): return 1
+
+    recipes = synth_recipes(rng, args.recipes)
+    index = server.FlavorIndex(None, recipes)
+    t0 = time.perf_counter()
+    index.current()
+    build = time.perf_counter() - t0
+    print(f"Index: {len(index.recipes)} Rezepte, Bau {build * 1000:.0f} ms, Matrix {index.matrix.nbytes / 2**20:.1f} MB")
+
+    queries = []
+    for _ in range(args.queries):
+        prefer = rng.choice(server.CATS + [None])
+        if rng.random() < 0.5 and prefer is not None:
+            vec = server.edition_vectors()[server.EDITION_ROW[prefer]]
+        else:
+            vec = server.flavor_vector(rng.sample(FLAVORED + NEUTRAL, rng.randint(1, 4)))
+        queries.append((vec, prefer))
+
+    rows, mask = index.matrix.tolist(), index.gin_mask.tolist()
+    t_vec = t_ref = 0.0
+    for vec, prefer in queries:
+        t0 = time.perf_counter()
+        got = index.top_k(vec, args.k, prefer)
+        t_vec += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        want = top_k_ref(rows, mask, vec.tolist(), args.k, prefer)
+        t_ref += time.perf_counter() - t0
+        s = index.scores(vec, prefer)
+        got_scores = [float(s[int(r["name"].split()[1])]) for r in got]
+        if len(got) != len(want) or any(abs(a - b) > 1e-5 for a, b in zip(got_scores, want)):
+            print(f"ABWEICHUNG prefer={prefer} vec={vec.tolist()}: top_k {got_scores}, Referenz {want}")
+            return 1
+    n = len(queries)
+    print(f"{n} Anfragen, k={args.k}: Python {t_ref / n * 1000:.1f} ms, vektorisiert {t_vec / n * 1000:.2f} ms "
+          f"→ {t_ref / t_vec:.0f}x, Ergebnisse gleich")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
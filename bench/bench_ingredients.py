@@ -0,0 +1,118 @@
+# bench/bench_ingredients.py — Zutaten-Index & Geschmacksklassen: Parität und Skalierung
+#
+#   python bench/bench_ingredients.py                     # 50 000 synthetische Rezepte
+#   python bench/bench_ingredients.py --recipes 200000 --queries 2000
+#
+# 1) ingredient_flavors() liefert für jede Zutat dieselben Klassen wie die alten verschachtelten Scans.
+# 2) IngredientIndex.search() liefert dieselben Top-k wie ein linearer Scan über alle Rezepte – und wie schnell.
+# Exit-Code 1 bei einer Abweichung.
+
+from __future__ import annotations
+import os, sys, time, random, argparse
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import server  # noqa: E402
+
+def legacy_flavors(asked: List[str]) -> Dict[str, bool]:
+    # Eingefrorene Kopie aus generate_cocktail bis v1.7
+    return {
+        "citrus": any(any(c in a for c in server.CITRUS) for a in asked),
+        "bubbly": any(any(b in a for b in server.BUBBLY) for a in asked),
+        "sweet":  any(any(s in a for s in server.SWEET) for a in asked),
+        "herbs":  any(any(h in a for h in server.HERBS) for a in asked),
+        "bitter": any(any(b in a for b in server.BITTER) for a in asked),
+        "fruity": any(any(f in a for f in server.FRUITY) for a in asked),
+    }
+
+WORDS = (server.CITRUS + server.SWEET + server.BITTER + server.HERBS + server.BUBBLY + server.FRUITY
+         + ["wermut","sherry","ingwer","gurke","holunder","pfeffer","chili","kaffee","kakao","lavendel","rhabarber",
+            "apfel","birne","quitte","kirsche","johannisbeere","zimt","kardamom","salz","eiweiss","sahne"])
+
+def synthetic_recipes(n: int, seed: int = 3) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    # seltene Fantasie-Zutaten, damit das Vokabular wie bei echten Sammlungen wächst
+    vocab = WORDS + [f"{rng.choice(WORDS)}{rng.choice(['likoer','sirup','saft','schaum','zeste','wasser'])}" for _ in range(2000)]
+    gins = list(server.CATS)
+    return [{"name": f"Rezept {i}", "gins": [rng.choice(gins)],
+             "ingredients": ["50 ml Gin"] + [f"{rng.randint(5, 40)} ml {rng.choice(vocab).capitalize()}" for _ in range(rng.randint(2, 6))] + ["Eis"],
+             "instructions": "Shaken."} for i in range(n)]
+
+def linear_search(recipes: List[Dict[str, Any]], asked: List[str], prefer: Optional[str], k: int) -> List[Dict[str, Any]]:
+    # Referenz: jedes Rezept einzeln gegen jede Wunsch-Zutat prüfen (gleiche Präfix-/Rangregeln)
+    wanted = list(dict.fromkeys(t for a in asked for t in server.ingredient_terms(a)))
+    stems = [t[:-1] if len(t) > 4 and t.endswith("n") else t for t in wanted]
+    scored = []
+    for i, r in enumerate(recipes):
+        terms = {t for ing in r["ingredients"] for t in server.ingredient_terms(str(ing))}
+        hits = sum(1 for s in stems if any(t.startswith(s) for t in terms))
+        if not hits: continue
+        fits = prefer is not None and prefer in (server.norm(g) for g in r.get("gins") or [])
+        scored.append(((hits, fits, -(len(terms) - hits), -i), r))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [r for _, r in scored[:k]]
+
+class FixedStore:
+    # liefert immer denselben Snapshot – der Index baut genau einmal
+    def __init__(self, extra: List[Dict[str, Any]]):
+        self.snap = server.RecipeSnapshot(None, extra, {}, 0.0, None)
+    def current(self):
+        return self.snap
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipes", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--linear", type=int, default=20, help="Anfragen, die zusätzlich linear geprüft werden")
+    args = ap.parse_args()
+    rng = random.Random(5)
+    bad = 0
+
+    asked_sets = [server.parse_ingredients_freeform(q) for q in [
+        "Mach mir einen Cocktail mit Limette, Basilikum und Soda", "Drink mit Orange & Campari",
+        "Cocktail mit Erdbeere und Sekt", "mach mir einen drink aus gurke, minze + tonic",
+        "Cocktail mit orange bitters und soda water", "Drink mit Grapefruit, Rosmarin und Prosecco"]]
+    asked_sets += [[rng.choice(WORDS) + rng.choice(["", "n", " saft", "sirup"]) for _ in range(rng.randint(1, 4))] for _ in range(5000)]
+    for asked in asked_sets:
+        fl = frozenset().union(*map(server.ingredient_flavors, asked))
+        want = legacy_flavors(asked)
+        if {c for c, v in want.items() if v} != set(fl):
+            bad += 1
+            print(f"FLAVOR  {asked}: erwartet {want}, bekommen {sorted(fl)}")
+    print(f"Geschmacksklassen: {len(asked_sets)} Zutatenlisten, {bad} Abweichungen")
+
+    recipes = synthetic_recipes(args.recipes)
+    idx = server.IngredientIndex(FixedStore(recipes), [])
+    t0 = time.perf_counter()
+    idx.current()
+    build_ms = (time.perf_counter() - t0) * 1000
+    queries = [([rng.choice(WORDS) for _ in range(rng.randint(1, 4))], rng.choice(list(server.CATS) + [None])) for _ in range(args.queries)]
+
+    lin_bad = 0
+    t_lin = 0.0
+    for asked, prefer in queries[:args.linear]:
+        t0 = time.perf_counter()
+        want = linear_search(idx.recipes, asked, prefer, 3)
+        t_lin += time.perf_counter() - t0
+        got = idx.search(asked, prefer, 3)
+        if [r["name"] for r in got] != [r["name"] for r in want]:
+            lin_bad += 1
+            print(f"INDEX   {asked} {prefer}: erwartet {[r['name'] for r in want]}, bekommen {[r['name'] for r in got]}")
+    bad += lin_bad
+
+    lat = []
+    for asked, prefer in queries:
+        t0 = time.perf_counter()
+        idx.search(asked, prefer, 3)
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+    n_lin = max(1, min(args.linear, len(queries)))
+    print(f"Index: {len(idx.recipes)} Rezepte, {len(idx.vocab)} Zutaten-Wörter, Aufbau {build_ms:.0f} ms")
+    print(f"Parität gegen linearen Scan: {n_lin} Anfragen, {lin_bad} Abweichungen")
+    print(f"  Suche p50 {lat[len(lat) // 2] * 1000:.2f} ms   p95 {lat[int(len(lat) * 0.95)] * 1000:.2f} ms   "
+          f"linear Ø {t_lin / n_lin * 1000:.1f} ms")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
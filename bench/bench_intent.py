@@ -0,0 +1,114 @@
+# bench/bench_intent.py — Parität & Speed: IntentMatcher vs. alte extract_intent-Kaskade
+#
+#   python bench/bench_intent.py            # Golden-Korpus + Zufalls-Parität + Benchmark
+#   python bench/bench_intent.py --record   # intent_golden.json aus der alten Implementierung neu schreiben
+#
+# Exit-Code 1, sobald eine einzige Anfrage ein anderes Ergebnis liefert.
+
+from __future__ import annotations
+import os, sys, json, random, difflib, timeit, argparse
+from typing import Optional, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import server  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_golden.json")
+
+# Eingefrorene Kopie der Implementierung bis v1.7 – Referenz für die Parität
+def legacy_extract_intent(q: str) -> Optional[str]:
+    nq = server.norm(q)
+    if nq in server.ALIASES: return server.ALIASES[nq]
+    for cat, kws in server.KEYWORDS.items():
+        for kw in kws:
+            if kw in nq: return cat
+    for t in nq.split():
+        for cat, kws in server.KEYWORDS.items():
+            if any(kw == t or kw in t or t in kw for kw in kws): return cat
+    all_kws = [k for ks in server.KEYWORDS.values() for k in ks]
+    m = difflib.get_close_matches(nq, all_kws, n=1, cutoff=0.72)
+    if m:
+        mk = m[0]
+        for cat, ks in server.KEYWORDS.items():
+            if mk in ks: return cat
+    return None
+
+PHRASES = [
+    "Zeig Rotkäppchen", "Foodpairing Classic", "Rezept mit Froschkönig", "Geschenkideen", "Cocktail-Ideen",
+    "rotkapchen", "rotkapp", "rotkaep", "Rotkaeppchen bitte", "Frosch König", "frosch konig gin",
+    "Aschen Puttel", "Stern Taler", "gutshof classic", "Klassik", "LIMETTA!!", "mandarina tonic", "rosa ta",
+    "Was passt zu Sterntaler?", "zeig gin", "hallo", "wie viel alkohol", "versand nach österreich",
+    "Mach mir einen Cocktail mit Limette und Basilikum", "Drink mit Orange & Campari", "", "   ", "?!",
+    "rotkäpchen", "rotkappchn", "froschkonig", "froschkoenich", "aschenputel", "sterntahler", "clasic",
+    "limeta", "mandarine", "rosatta", "rosatta gin bitte", "ich suche ein geschenk für meine mutter",
+    "negroni mit mandarina", "a", "ta", "gin", "tonic", "zitrone soda", "xyz", "qqqqqqq", "rot",
+]
+
+def mutate(rng: random.Random, w: str) -> str:
+    # Tippfehler: löschen, vertauschen, ersetzen, einfügen
+    letters = "abcdefghijklmnopqrstuvwxyzäöü "
+    w = list(w)
+    for _ in range(rng.randint(1, 3)):
+        op = rng.randrange(4)
+        i = rng.randrange(len(w)) if w else 0
+        if op == 0 and len(w) > 1: del w[i]
+        elif op == 1 and i + 1 < len(w): w[i], w[i + 1] = w[i + 1], w[i]
+        elif op == 2 and w: w[i] = rng.choice(letters)
+        else: w.insert(i, rng.choice(letters))
+    return "".join(w)
+
+def misspelled_corpus(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    kws = [k for ks in server.KEYWORDS.values() for k in ks] + ["gutshof", "cocktail", "pairing", "geschenk"]
+    out = []
+    for _ in range(n):
+        w = mutate(rng, rng.choice(kws))
+        if rng.random() < 0.3: w = f"zeig mir {w} bitte"
+        out.append(w)
+    return out
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--record", action="store_true")
+    ap.add_argument("--random", type=int, default=20000, help="Anzahl zufälliger Tippfehler-Anfragen für die Parität")
+    ap.add_argument("--number", type=int, default=20, help="Wiederholungen für den Benchmark")
+    args = ap.parse_args()
+
+    if args.record:
+        golden = [[p, legacy_extract_intent(p)] for p in PHRASES + misspelled_corpus(300, seed=1)]
+        with open(GOLDEN, "w", encoding="utf-8") as f:
+            f.write("[\n" + ",\n".join(json.dumps(g, ensure_ascii=False) for g in golden) + "\n]\n")
+        print(f"{len(golden)} Einträge → {GOLDEN}")
+        return 0
+
+    bad = 0
+    with open(GOLDEN, encoding="utf-8") as f: golden = json.load(f)
+    for q, want in golden:
+        got = server.extract_intent(q)
+        if got != want:
+            bad += 1
+            print(f"GOLDEN  {q!r}: erwartet {want!r}, bekommen {got!r}")
+    rand = misspelled_corpus(args.random)
+    for q in rand:
+        want, got = legacy_extract_intent(q), server.extract_intent(q)
+        if got != want:
+            bad += 1
+            print(f"RANDOM  {q!r}: erwartet {want!r}, bekommen {got!r}")
+    print(f"Parität: {len(golden)} Golden + {len(rand)} zufällige Anfragen, {bad} Abweichungen")
+
+    sets = {
+        "golden": [q for q, _ in golden],
+        "tippfehler": misspelled_corpus(2000, seed=11),
+        "unbekannt (fuzzy)": [q for q in misspelled_corpus(5000, seed=13) if legacy_extract_intent(q) is None][:500]
+                              + ["ich haette gern etwas fuer einen gemuetlichen abend", "kannst du mir helfen"] * 50,
+    }
+    print(f"{'Korpus':<20}{'n':>6}{'alt µs':>10}{'neu µs':>10}{'Faktor':>8}")
+    for name, qs in sets.items():
+        t_old = timeit.timeit(lambda: [legacy_extract_intent(q) for q in qs], number=args.number)
+        t_new = timeit.timeit(lambda: [server.extract_intent(q) for q in qs], number=args.number)
+        per = args.number * len(qs)
+        print(f"{name:<20}{len(qs):>6}{t_old / per * 1e6:>10.2f}{t_new / per * 1e6:>10.2f}{t_old / t_new:>8.1f}x")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
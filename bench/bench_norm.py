@@ -0,0 +1,99 @@
+# bench/bench_norm.py — Gleichheit und Kosten von norm()/to_ascii_digraphs: alte Kette vs. Tabellen-Variante
+#
+#   python bench/bench_norm.py                   # alle Codepoints + 200k Zufallsstrings + Timing
+#   python bench/bench_norm.py --fuzz 1000000 --seed 7
+#
+# Gleichheit (Exit-Code 1 bei der ersten Abweichung, mit Beispiel):
+#   - jeder Codepoint U+0000 … U+10FFFF einzeln und zwischen Buchstaben/Leerzeichen (die Tabelle ist zeichenweise)
+#   - Zufallsstrings aus gemischten Alphabeten (ASCII, Umlaute, Latin, Combining, Unicode-Leerzeichen, CJK, Emoji)
+#   - Nachrichten aus bench/corpus.json, zufällig verändert
+# jeweils über norm (mit Memo), ohne Memo und norm_many.
+
+from __future__ import annotations
+import os, re, sys, json, random, timeit, argparse, unicodedata
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QUERY_LOG_ENABLED", "0")
+import server  # noqa: E402
+
+# ---- Referenz: die Kette vor der Tabelle, unverändert ----
+def to_ascii_digraphs_ref(s: str) -> str:
+    return (s.replace("Ä","Ae").replace("Ö","Oe").replace("Ü","Ue")
+             .replace("ä","ae").replace("ö","oe").replace("ü","ue")
+             .replace("ß","ss"))
+
+def norm_ref(s: str) -> str:
+    s = to_ascii_digraphs_ref(s).lower().strip()
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+ALPHABETS = [
+    [chr(c) for c in range(0x20, 0x7f)] + list("\t\n\r\x0b\x0c\x1c\x1f"),
+    list("ÄÖÜäöüßẞ"),
+    [chr(c) for c in range(0xa0, 0x250)],
+    [chr(c) for c in range(0x300, 0x370)],                                  # Combining
+    list("\u00a0\u1680\u2000\u2007\u200b\u2028\u2029\u202f\u3000\u0085"),       # Unicode-Leerzeichen
+    [chr(c) for c in range(0x370, 0x530)] + list("ΣσςİıŉǅﬀﬁⅫ①½ℌ™"),       # Griechisch/Kyrillisch, Sonderfälle
+    [chr(c) for c in range(0x4e00, 0x4e40)] + [chr(c) for c in range(0xac00, 0xac20)] + list("🍸🍋☕👑🐸⭐️"),
+]
+
+def random_string(rng: random.Random) -> str:
+    alphas = rng.sample(ALPHABETS, rng.randint(1, 3))
+    return "".join(rng.choice(rng.choice(alphas)) for _ in range(rng.randint(0, 60)))
+
+def mutate(rng: random.Random, msg: str) -> str:
+    chars = list(msg)
+    for _ in range(rng.randint(0, 4)):
+        pos = rng.randint(0, len(chars))
+        chars.insert(pos, rng.choice(rng.choice(ALPHABETS)))
+    if chars and rng.random() < 0.3: chars = [c.upper() if rng.random() < 0.5 else c for c in chars]
+    return "".join(chars)
+
+def check(inputs: List[str], what: str) -> int:
+    many = server.norm_many(inputs)
+    for s, m in zip(inputs, many):
+        want = norm_ref(s)
+        got = (server.norm(s), server._norm(s), m)
+        if any(g != want for g in got) or server.to_ascii_digraphs(s) != to_ascii_digraphs_ref(s):
+            print(f"ABWEICHUNG ({what}) {s!r}: erwartet {want!r}, norm/_norm/norm_many {got!r}")
+            return 1
+    return 0
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fuzz", type=int, default=200_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--number", type=int, default=20_000, help="Timing: Wiederholungen")
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.json"), encoding="utf-8") as f:
+        corpus = [m for msgs in json.load(f).values() for m in msgs]
+
+    cps = [chr(c) for c in range(0x110000)]
+    if check(cps, "Codepoint"): return 1
+    if check([f"Ab{c}Cd {c} {c}{c}" for c in cps], "Codepoint im Kontext"): return 1
+    print(f"Codepoints: {len(cps)} einzeln und im Kontext gleich")
+    if check([random_string(rng) for _ in range(args.fuzz)], "Zufall"): return 1
+    if check([mutate(rng, rng.choice(corpus)) for _ in range(args.fuzz // 4)], "Korpus"): return 1
+    print(f"Zufallsstrings: {args.fuzz} + {args.fuzz // 4} Korpus-Mutationen gleich")
+
+    n = args.number
+    per = lambda t: t / (n * len(corpus)) * 1e9
+    t_ref = timeit.timeit(lambda: [norm_ref(m) for m in corpus], number=n // 10) * 10
+    t_raw = timeit.timeit(lambda: [server._norm(m) for m in corpus], number=n)
+    t_memo = timeit.timeit(lambda: [server.norm(m) for m in corpus], number=n)
+    print(f"Korpus ({len(corpus)} Nachrichten), ns/Aufruf: alt {per(t_ref):.0f}, Tabelle {per(t_raw):.0f}, "
+          f"mit Memo {per(t_memo):.0f}  → {t_ref / t_raw:.1f}x / {t_ref / t_memo:.1f}x")
+    gins = [g for r in server.RECIPES_BUILTIN + server.CLASSICS for g in r.get("gins", [])] * 200
+    t_loop = timeit.timeit(lambda: [norm_ref(g) for g in gins], number=5)
+    t_many = timeit.timeit(lambda: server.norm_many(gins), number=5)
+    print(f"Bulk ({len(gins)} Rezept-Gins): alt {t_loop / 5 * 1000:.1f} ms, norm_many {t_many / 5 * 1000:.1f} ms → {t_loop / t_many:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
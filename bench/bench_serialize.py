@@ -0,0 +1,67 @@
+# bench/bench_serialize.py — Kosten von Antwort-Aufbau + JSON-Kodierung pro Route, alt vs. neu
+#
+#   python bench/bench_serialize.py
+#   python bench/bench_serialize.py --number 5000
+#
+# alt: ChatOut/RecipeCard/ProductCard pro Request validieren, model_dump(mode="json"), json.dumps (JSONResponse)
+# neu: statische Antworten liefern ihre beim Start kodierten Bytes, dynamische gehen über chat_body()
+# Beide Wege müssen für jede Nachricht aus bench/corpus.json byte-identisch sein (sonst Exit-Code 1).
+
+from __future__ import annotations
+import os, sys, json, timeit, argparse
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QUERY_LOG_ENABLED", "0")
+import server  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+def fake_products(frag: str) -> List[Dict[str, Any]]:
+    # so sehen Shopify-Treffer nach shopify_fetch_by_title aus
+    return [{"title": f"Gutshof Gin {frag} {size}", "url": f"https://shop.example/products/gutshof-gin-{i}",
+             "image": f"https://cdn.example/gutshof-gin-{i}.jpg", "price": price, "currency": "EUR"}
+            for i, (size, price) in enumerate((("0,5 l", "34.90"), ("0,1 l", "12.90"), ("Geschenkbox", "44.90")))]
+
+def build(msg: str) -> server.ChatOut:
+    t = server.Turn(msg.strip(), server.norm(msg))
+    out = server.prepare_answer(t)
+    if t.frag is not None: out = server.finish_answer(t, out, fake_products(t.frag))
+    return out
+
+def old_path(out: server.ChatOut) -> bytes:
+    fresh = server.ChatOut(**out.model_dump())          # Validierung wie beim Bau pro Request
+    return JSONResponse(fresh.model_dump(mode="json")).body
+
+def new_path(out: server.ChatOut) -> bytes:
+    if out.__pydantic_private__["_body"] is not None:     # statisch: beim Start kodiert
+        return server.chat_body(out)
+    fresh = server.ChatOut(**out.model_dump())            # dynamisch: pro Request gebaut …
+    return server.chat_body(fresh)                        # … und direkt von pydantic-core kodiert
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=2000, help="Wiederholungen je Nachricht")
+    args = ap.parse_args()
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    bad = 0
+    print(f"{'Route':<18}{'n':>4}{'statisch':>10}{'Bytes':>8}{'alt µs':>10}{'neu µs':>10}{'Faktor':>8}")
+    for route, msgs in corpus.items():
+        outs = [build(m) for m in msgs]
+        for m, out in zip(msgs, outs):
+            if old_path(out) != new_path(out):
+                bad += 1
+                print(f"BYTES   {m!r}:\n  {old_path(out)!r}\n  {new_path(out)!r}")
+        static = sum(out.__pydantic_private__["_body"] is not None for out in outs)
+        size = sum(len(old_path(o)) for o in outs) // len(outs)
+        t_old = timeit.timeit(lambda: [old_path(o) for o in outs], number=args.number)
+        t_new = timeit.timeit(lambda: [new_path(o) for o in outs], number=args.number)
+        per = args.number * len(outs)
+        print(f"{route:<18}{len(outs):>4}{static:>10}{size:>8}{t_old / per * 1e6:>10.2f}{t_new / per * 1e6:>10.2f}{t_old / t_new:>8.1f}x")
+    print(f"Byte-Gleichheit: {bad} Abweichungen")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# bench/bench_sessions.py — Speicher-Obergrenze und Kosten des Session-Stores
+#
+#   python bench/bench_sessions.py                      # 100k Sessions, danach 2× so viele neue (Verdrängung)
+#   python bench/bench_sessions.py --sessions 20000 --max-mb 40
+#
+# Füllt den Store mit Worst-Case-Sessions (64-Zeichen-IDs, 8 lange Zutaten, Rezepte, Produkte) und misst mit
+# tracemalloc, was er hält. Danach kommen doppelt so viele neue Gespräche dazu: Anzahl und Speicher dürfen
+# nicht weiter wachsen. Vorab läuft ein Cocktail-Wunsch ohne Zutaten (Hilfetext) mit Session durch answer().
+# Exit-Code 1, wenn das scheitert oder die Obergrenze (--max-mb) bzw. maxsize überschritten wird.
+
+from __future__ import annotations
+import os, sys, time, asyncio, argparse, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QUERY_LOG_ENABLED", "0")
+import server  # noqa: E402
+
+def sample_outs():
+    # Antworten, wie sie aus dem Antwort-Cache kommen – Sessions halten nur Referenzen darauf
+    custom = server.ChatOut(response="Deine individuelle Cocktail-Idee 🍸",
+                            recipes=[server.RecipeCard(name="Gutshof Spritz", instructions="…")] + server.STATIC_SUGGESTIONS[None].recipes)
+    edition = server.ChatOut(response="Hier ist Rotkäppchen 🍓", products=[
+        server.ProductCard(title=f"Rotkäppchen {i}", url=f"https://shop.example/products/rk-{i}", price="29.90", currency="EUR")
+        for i in range(10)])
+    return custom, edition
+
+def fill(store: server.SessionStore, start: int, n: int, custom: server.ChatOut, edition: server.ChatOut) -> float:
+    t0 = time.perf_counter()
+    for i in range(start, start + n):
+        s = store.get(f"{i:064d}")
+        ings = [f"{j}-{i:038d}" for j in range(8)]          # 8 Zutaten à 40 Zeichen (Maximum)
+        store.update(s, "custom_cocktail", "rotkaeppchen", custom, ingredients=ings)
+        store.update(s, "edition", "rotkaeppchen", edition, "Rotkäppchen")
+    return time.perf_counter() - t0
+
+def check_help_turn() -> bool:
+    # Cocktail-Wunsch ohne erkennbare Zutaten → Hilfetext ohne Rezepte; darf die Session nicht kaputt machen
+    # (zweiter Aufruf kommt aus dem Antwort-Cache)
+    async def run() -> None:
+        for _ in range(2):
+            out = await server.answer("Drink mit etwas", session_id="bench-help")
+            if out is not server.STATIC_CUSTOM_HELP: raise AssertionError(out.response)
+    try:
+        asyncio.run(run())
+    except Exception as ex:
+        print(f"FEHLER: Hilfe-Antwort mit Session: {type(ex).__name__}: {ex}")
+        return False
+    return True
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=100_000)
+    ap.add_argument("--max-mb", type=float, default=200, help="Obergrenze für den Store bei --sessions Einträgen")
+    args = ap.parse_args()
+
+    if not check_help_turn(): return 1
+    custom, edition = sample_outs()
+    # Laufzeit ohne tracemalloc (das bremst jede Allokation)
+    timed = server.SessionStore(args.sessions, ttl=3600)
+    dt = fill(timed, 0, args.sessions, custom, edition)
+    dt2 = fill(timed, args.sessions, 2 * args.sessions, custom, edition)
+    del timed
+
+    store = server.SessionStore(args.sessions, ttl=3600)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fill(store, 0, args.sessions, custom, edition)
+    full = tracemalloc.get_traced_memory()[0] - base
+    fill(store, args.sessions, 2 * args.sessions, custom, edition)
+    churned = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    n = args.sessions
+    print(f"Sessions: {len(store)} (maxsize {store.maxsize}), verdrängt {store.stats['evictions']}")
+    print(f"Speicher voll:          {full / 2**20:8.1f} MB  ({full / n:.0f} B/Session)")
+    print(f"Speicher nach Churn:    {churned / 2**20:8.1f} MB  ({3 * n} Gespräche insgesamt)")
+    print(f"get+update:             {dt / n * 1e6:8.2f} µs/Session (füllen), {dt2 / (2 * n) * 1e6:.2f} µs (mit Verdrängung)")
+    ok = len(store) <= store.maxsize and churned <= args.max_mb * 2**20 and churned <= full * 1.1
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
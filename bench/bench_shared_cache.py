@@ -0,0 +1,89 @@
+# bench/bench_shared_cache.py — Upstream-Traffic mit N uvicorn-Workern: eigener vs. geteilter Produkt-Cache
+#
+#   python bench/bench_shared_cache.py                 # 4 Worker, memory vs. sqlite
+#   python bench/bench_shared_cache.py --workers 8 --rounds 20
+#
+# Spielt den Korpus mehrfach über frische Verbindungen ab (→ verteilt sich über alle Worker) und zählt die
+# Aufrufe am Fake-Storefront. Mit CACHE_BACKEND=memory fragt jeder Worker selbst, mit sqlite sollte es etwa
+# 1/N davon sein. Exit-Code 1, wenn das Verhältnis deutlich darüber liegt.
+
+from __future__ import annotations
+import os, sys, time, asyncio, argparse, subprocess, tempfile
+from typing import Dict, List, Tuple
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from loadtest import free_port, wait_http, load_corpus  # noqa: E402
+
+async def replay(base: str, corpus: List[Tuple[str, str]], rounds: int, concurrency: int) -> int:
+    # keine Keep-Alive-Verbindungen: jeder Request wird neu angenommen, der Kernel verteilt auf die Worker
+    msgs = [m for _ in range(rounds) for _, m in corpus]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    errors = 0
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as c:
+        sem = asyncio.Semaphore(concurrency)
+        async def one(m: str) -> None:
+            nonlocal errors
+            async with sem:
+                r = await c.post("/chat", json={"message": m})
+                errors += r.status_code != 200
+        await asyncio.gather(*(one(m) for m in msgs))
+    return errors
+
+def run(backend: str, args: argparse.Namespace, corpus: List[Tuple[str, str]], storefront: str) -> Dict[str, int]:
+    port = free_port()
+    db = os.path.join(tempfile.mkdtemp(prefix="emil-cache-"), "cache.sqlite3")
+    env = dict(os.environ, SHOPIFY_STOREFRONT_DOMAIN="fake-storefront.local", SHOPIFY_STOREFRONT_TOKEN="bench",
+               SHOPIFY_GRAPHQL_URL=f"{storefront}/api/2025-01/graphql.json", SHOP_URL_BASE="https://shop.example",
+               CACHE_BACKEND=backend, CACHE_SQLITE_PATH=db, QUERY_LOG_ENABLED="0", LOG_LEVEL="WARNING")
+    httpx.post(f"{storefront}/stats/reset")
+    p = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--workers", str(args.workers),
+                          "--log-level", "warning", "--no-access-log"], cwd=ROOT, env=env)
+    try:
+        wait_http(f"http://127.0.0.1:{port}/health")
+        time.sleep(0.5 * args.workers)   # alle Worker oben, bevor der Traffic startet
+        t0 = time.perf_counter()
+        errors = asyncio.run(replay(f"http://127.0.0.1:{port}", corpus, args.rounds, args.concurrency))
+        wall = time.perf_counter() - t0
+        stats = httpx.get(f"{storefront}/stats").json()
+    finally:
+        p.terminate()
+        p.wait(15)
+    return {"upstream": stats["requests"], "fragments": len(stats["queries"]), "errors": errors, "wall_ms": round(wall * 1000)}
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--latency-ms", type=float, default=80)
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    sf_port = free_port()
+    storefront = f"http://127.0.0.1:{sf_port}"
+    sf = subprocess.Popen([sys.executable, os.path.join(HERE, "fake_storefront.py"), "--port", str(sf_port),
+                           "--latency-ms", str(args.latency_ms), "--jitter-ms", "20"])
+    try:
+        wait_http(f"{storefront}/stats")
+        res = {b: run(b, args, corpus, storefront) for b in ("memory", "sqlite")}
+    finally:
+        sf.terminate()
+        sf.wait(10)
+
+    n = len(corpus) * args.rounds
+    print(f"{args.workers} Worker, {n} Requests ({args.rounds} Runden), Storefront {args.latency_ms} ms")
+    print(f"  {'Backend':<10}{'Upstream':>10}{'Fragmente':>11}{'Fehler':>8}{'Dauer ms':>10}")
+    for b, r in res.items():
+        print(f"  {b:<10}{r['upstream']:>10}{r['fragments']:>11}{r['errors']:>8}{r['wall_ms']:>10}")
+    ratio = res["sqlite"]["upstream"] / max(1, res["memory"]["upstream"])
+    print(f"  sqlite/memory = {ratio:.2f}  (Ziel ≈ 1/{args.workers} = {1 / args.workers:.2f})")
+    ok = res["sqlite"]["upstream"] <= res["sqlite"]["fragments"] * 1.2 and ratio <= 1.5 / args.workers
+    ok = ok and not (res["memory"]["errors"] or res["sqlite"]["errors"])
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# bench/bench_startup.py — Kaltstart: Zeit bis zur ersten /health- und /chat-Antwort
+#
+#   python bench/bench_startup.py                      # je 5 Starts: ohne Snapshot, Snapshot kalt, Snapshot warm
+#   python bench/bench_startup.py --runs 10 --message "Cocktail mit Gurke und Minze"
+#
+# Startet uvicorn wie auf den Instanzen (ein Worker, PORT frei gewählt) und misst ab Prozessstart, wann /health
+# erstmals 200 liefert und wann danach der erste POST /chat fertig ist. Varianten:
+#   ohne     – STARTUP_SNAPSHOT leer (alles wird beim Import gerechnet)
+#   kalt     – STARTUP_SNAPSHOT gesetzt, Datei fehlt (wird gebaut und geschrieben)
+#   warm     – Datei aus dem vorigen Start vorhanden
+# Exit-Code 1, wenn ein Start scheitert oder der warme Start den Snapshot nicht lädt.
+
+from __future__ import annotations
+import os, sys, time, argparse, tempfile, statistics, subprocess
+from typing import Dict, List
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+from loadtest import free_port  # noqa: E402
+
+def first_ok(c: httpx.Client, method: str, url: str, deadline: float, **kw) -> float:
+    # pollt, bis die Antwort 200 ist; Zeitpunkt (perf_counter) der ersten erfolgreichen Antwort
+    while time.perf_counter() < deadline:
+        try:
+            if c.request(method, url, **kw).status_code == 200: return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.002)
+    raise RuntimeError(f"{url} nicht erreichbar")
+
+def boot(snapshot: str, message: str) -> Dict[str, float]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, STARTUP_SNAPSHOT=snapshot, QUERY_LOG_ENABLED="0", LOG_LEVEL="WARNING", PORT=str(port))
+    t0 = time.perf_counter()
+    p = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port),
+                          "--log-level", "warning", "--no-access-log"], cwd=ROOT, env=env)
+    try:
+        with httpx.Client(timeout=5) as c:
+            t_health = first_ok(c, "GET", f"{base}/health", t0 + 30)
+            t_chat = first_ok(c, "POST", f"{base}/chat", t0 + 30, json={"message": message})
+            status = c.get(f"{base}/diag/startup").json()["status"]
+    finally:
+        p.terminate()
+        p.wait(15)
+    return {"health_ms": (t_health - t0) * 1000, "chat_ms": (t_chat - t0) * 1000, "status": status}
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--message", default="Zeig Rotkäppchen")
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="emil-startup-"), "snapshot.marshal")
+    res: Dict[str, List[Dict[str, float]]] = {"ohne": [], "kalt": [], "warm": []}
+    for _ in range(args.runs):
+        res["ohne"].append(boot("", args.message))
+        if os.path.exists(path): os.unlink(path)
+        res["kalt"].append(boot(path, args.message))
+        res["warm"].append(boot(path, args.message))
+
+    print(f"{args.runs} Starts je Variante, erste Nachricht {args.message!r} (Median / Minimum in ms)")
+    print(f"  {'Variante':<10}{'/health':>16}{'/chat':>16}  Snapshot")
+    for name, runs in res.items():
+        h = [r["health_ms"] for r in runs]
+        c = [r["chat_ms"] for r in runs]
+        print(f"  {name:<10}{statistics.median(h):>9.0f} / {min(h):<4.0f}{statistics.median(c):>9.0f} / {min(c):<4.0f}"
+              f"  {', '.join(sorted({r['status'] for r in runs}))}")
+    ok = all(r["status"] == "loaded" for r in res["warm"]) and all(r["status"] == "missing" for r in res["kalt"])
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
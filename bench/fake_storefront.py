@@ -0,0 +1,94 @@
+# bench/fake_storefront.py — lokaler Stand-in für die Shopify Storefront GraphQL API
+#
+#   python bench/fake_storefront.py --port 18900 --latency-ms 120 --jitter-ms 40 --error-rate 0.02
+#
+# Versteht die Produktsuche von Emil („title:X OR tag:X“) inkl. Paging (first/after) und zählt alle
+# Aufrufe unter GET /stats (POST /stats/reset setzt zurück).
+
+from __future__ import annotations
+import argparse, asyncio, random
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+EDITIONS = ["Rotkäppchen","Froschkönig","Aschenputtel","Sterntaler","Classic","Limetta","Mandarina","Rosata"]
+
+def build_catalog(extra: int = 0) -> List[Dict[str, Any]]:
+    items = []
+    for ed in EDITIONS:
+        for size, price in (("0,5 l", "34.90"), ("0,1 l", "12.90")):
+            handle = f"gutshof-gin-{ed.lower()}-{size.split()[0].replace(',', '')}"
+            items.append({"title": f"Gutshof Gin {ed} {size}", "handle": handle, "tags": ["Gin", ed],
+                          "price": price, "image": f"https://cdn.example/{handle}.jpg"})
+    items.append({"title": "Märchen-Set", "handle": "maerchen-set", "tags": ["Gin", "Geschenk"],
+                  "price": "79.00", "image": "https://cdn.example/maerchen-set.jpg"})
+    for i in range(extra):
+        items.append({"title": f"Zubehör {i}", "handle": f"zubehoer-{i}", "tags": ["Zubehör"],
+                      "price": "9.90", "image": ""})
+    return items
+
+def matches(item: Dict[str, Any], q: str) -> bool:
+    # „title:X OR tag:X“ → X kommt im Titel vor oder ist ein Tag
+    if not q: return True
+    terms = [t.split(":", 1)[1].strip().lower() for t in q.split(" OR ") if ":" in t]
+    title, tags = item["title"].lower(), [t.lower() for t in item["tags"]]
+    return any(t in title or t in tags for t in terms)
+
+def node(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "title": item["title"], "handle": item["handle"], "tags": item["tags"],
+        "variants": {"edges": [{"node": {"price": {"amount": item["price"], "currencyCode": "EUR"}}}]},
+        "images": {"edges": [{"node": {"url": item["image"]}}] if item["image"] else []},
+    }
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, extra: int = 0, seed: int = 1) -> FastAPI:
+    app = FastAPI(title="Fake Storefront")
+    catalog = build_catalog(extra)
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "queries": {}}
+
+    @app.post("/api/{version}/graphql.json")
+    async def graphql(version: str, request: Request):
+        body = await request.json()
+        var = body.get("variables") or {}
+        stats["requests"] += 1
+        q = var.get("q") or ""
+        stats["queries"][q] = stats["queries"].get(q, 0) + 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if delay: await asyncio.sleep(delay)
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"errors": [{"message": "simulated"}]}, status_code=503)
+        hits = [it for it in catalog if matches(it, q)]
+        first = int(var.get("first") or 10)
+        start = int(var.get("after") or 0)
+        page = hits[start:start + first]
+        end = start + len(page)
+        return {"data": {"products": {
+            "edges": [{"cursor": str(start + i + 1), "node": node(it)} for i, it in enumerate(page)],
+            "pageInfo": {"hasNextPage": end < len(hits), "endCursor": str(end)},
+        }}}
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/stats/reset")
+    def reset_stats():
+        stats.update(requests=0, errors=0, queries={})
+        return stats
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=18900)
+    ap.add_argument("--latency-ms", type=float, default=120)
+    ap.add_argument("--jitter-ms", type=float, default=40)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--extra-products", type=int, default=0)
+    a = ap.parse_args()
+    uvicorn.run(create_app(a.latency_ms, a.jitter_ms, a.error_rate, a.extra_products),
+                host="127.0.0.1", port=a.port, log_level="warning")
@@ -0,0 +1,230 @@
+# bench/loadtest.py — Durchsatz & Latenz von Emil gegen einen lokalen Fake-Storefront
+#
+#   python bench/loadtest.py                                   # Standardlauf
+#   python bench/loadtest.py --requests 5000 --concurrency 64 --latency-ms 250 --error-rate 0.05
+#   python bench/loadtest.py --env RESPONSE_CACHE_MAX=0        # Pipeline ohne Antwort-Cache messen
+#
+# Ablauf: Fake-Storefront (bench/fake_storefront.py) und Emil (uvicorn server:app) als eigene Prozesse
+# starten, den Korpus aus bench/corpus.json (jede /chat-Route) abspielen, danach ein CPU-Profil
+# in-process aufnehmen. Ergebnisse landen in bench/results/<zeit>_<git>.json (+ .prof) und werden
+# mit dem vorherigen Lauf verglichen; --fail-on-regression liefert dann Exit-Code 2.
+
+from __future__ import annotations
+import os, sys, json, time, glob, socket, asyncio, argparse, subprocess, tempfile, cProfile, pstats
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+RESULTS = os.path.join(HERE, "results")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_http(url: str, timeout: float = 20) -> None:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500: return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} nicht erreichbar")
+
+def git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def load_corpus() -> List[Tuple[str, str]]:
+    with open(os.path.join(HERE, "corpus.json"), encoding="utf-8") as f:
+        return [(route, msg) for route, msgs in json.load(f).items() for msg in msgs]
+
+def emil_env(args: argparse.Namespace, storefront: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "SHOPIFY_STOREFRONT_DOMAIN": "fake-storefront.local",
+        "SHOPIFY_STOREFRONT_TOKEN": "bench",
+        "SHOPIFY_GRAPHQL_URL": f"{storefront}/api/2025-01/graphql.json",
+        "SHOP_URL_BASE": "https://shop.example",
+        "LOG_LEVEL": "WARNING",
+        "QUERY_LOG_PATH": os.path.join(tempfile.gettempdir(), f"emil-loadtest-{os.getpid()}.jsonl"),
+    })
+    for kv in args.env:
+        k, _, v = kv.partition("=")
+        env[k] = v
+    return env
+
+def check_coverage(corpus: List[Tuple[str, str]]) -> Dict[str, int]:
+    # jede Nachricht muss in der Route landen, unter der sie im Korpus steht
+    import server
+    seen: Dict[str, int] = {}
+    for want, msg in corpus:
+        got = server.ROUTER.classify(server.norm(msg)).route
+        if got != want: raise SystemExit(f"Korpus: „{msg}“ landet in {got}, erwartet {want}")
+        seen[want] = seen.get(want, 0) + 1
+    missing = [r for r, _ in server.ROUTE_RULES if r not in seen]
+    if missing: raise SystemExit(f"Korpus deckt diese Routen nicht ab: {missing}")
+    return seen
+
+async def run_load(base: str, corpus: List[Tuple[str, str]], n: int, concurrency: int) -> Tuple[List[Tuple[str, float, int]], float]:
+    records: List[Tuple[str, float, int]] = []
+    nxt = iter(range(n))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as c:
+        async def worker():
+            for i in nxt:
+                route, msg = corpus[i % len(corpus)]
+                t0 = time.perf_counter()
+                try:
+                    status = (await c.post("/chat", json={"message": msg})).status_code
+                except httpx.HTTPError:
+                    status = 0
+                records.append((route, time.perf_counter() - t0, status))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return records, time.perf_counter() - t0
+
+def pct(values: List[float], p: float) -> float:
+    if not values: return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(p / 100 * (len(v) - 1))))]
+
+def summarize(records: List[Tuple[str, float, int]], wall: float) -> Dict[str, Any]:
+    def block(lat: List[float], errors: int) -> Dict[str, Any]:
+        return {"n": len(lat), "errors": errors, "p50_ms": round(pct(lat, 50) * 1000, 3),
+                "p95_ms": round(pct(lat, 95) * 1000, 3), "p99_ms": round(pct(lat, 99) * 1000, 3)}
+    per: Dict[str, Any] = {}
+    for route in sorted({r for r, _, _ in records}):
+        rs = [(l, s) for r, l, s in records if r == route]
+        per[route] = block([l for l, _ in rs], sum(1 for _, s in rs if s != 200))
+    total = block([l for _, l, _ in records], sum(1 for _, _, s in records if s != 200))
+    return {"rps": round(len(records) / wall, 1), "wall_s": round(wall, 3), **total, "routes": per}
+
+def profile(corpus: List[Tuple[str, str]], n: int, prof_path: str, top: int) -> List[Dict[str, Any]]:
+    # CPU-Profil der App selbst: gleicher Prozess, ASGI direkt, Event-Loop im selben Thread wie cProfile
+    import server
+    async def drive():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://emil") as c:
+            for i in range(n):
+                await c.post("/chat", json={"message": corpus[i % len(corpus)][1]})
+        await server.close_http()
+    pr = cProfile.Profile()
+    pr.enable()
+    asyncio.run(drive())
+    pr.disable()
+    pr.dump_stats(prof_path)
+    st = pstats.Stats(pr)
+    rows = []
+    for (fn, line, name), (cc, nc, tt, ct, _) in st.stats.items():  # type: ignore[attr-defined]
+        rows.append({"func": f"{os.path.relpath(fn, ROOT) if fn.startswith(ROOT) else os.path.basename(fn)}:{line}({name})",
+                     "ncalls": nc, "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)})
+    rows.sort(key=lambda r: r["tottime_ms"], reverse=True)
+    return rows[:top]
+
+def previous_result(exclude: str) -> Optional[Dict[str, Any]]:
+    files = sorted(f for f in glob.glob(os.path.join(RESULTS, "*.json")) if f != exclude)
+    if not files: return None
+    with open(files[-1], encoding="utf-8") as f: return json.load(f)
+
+def compare(prev: Dict[str, Any], cur: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\nVergleich mit {prev['meta']['git']} ({prev['meta']['time']}):")
+    rows = [("rps", prev["load"]["rps"], cur["load"]["rps"], True)]
+    rows += [(k, prev["load"][k], cur["load"][k], False) for k in ("p50_ms", "p95_ms", "p99_ms")]
+    for route, cur_r in cur["load"]["routes"].items():
+        prev_r = prev["load"]["routes"].get(route)
+        if prev_r: rows.append((f"{route}.p95_ms", prev_r["p95_ms"], cur_r["p95_ms"], False))
+    for name, a, b, higher_better in rows:
+        delta = (b - a) / a * 100 if a else 0.0
+        worse = -delta if higher_better else delta
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag: regressions.append(name)
+        print(f"  {name:<28}{a:>12.3f}{b:>12.3f}{delta:>+9.1f}%{flag}")
+    return regressions
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--warmup", type=int, default=100)
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn-Worker für Emil")
+    ap.add_argument("--latency-ms", type=float, default=120, help="Fake-Storefront: mittlere Latenz")
+    ap.add_argument("--jitter-ms", type=float, default=40)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE für den Emil-Prozess (mehrfach)")
+    ap.add_argument("--profile-requests", type=int, default=500, help="0 = kein CPU-Profil")
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--threshold", type=float, default=10.0, help="Regression ab x %% Verschlechterung")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    ap.add_argument("--no-save", action="store_true")
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    sf_port, emil_port = free_port(), free_port()
+    storefront = f"http://127.0.0.1:{sf_port}"
+    env = emil_env(args, storefront)
+    os.environ.update(env)  # Korpus-Check und CPU-Profil laufen in-process gegen denselben Fake-Storefront
+    sys.path.insert(0, ROOT)
+    coverage = check_coverage(corpus)
+    stamp, rev = time.strftime("%Y%m%d-%H%M%S"), git_rev()
+    out_path = os.path.join(RESULTS, f"{stamp}_{rev}.json")
+    os.makedirs(RESULTS, exist_ok=True)
+
+    procs = [
+        subprocess.Popen([sys.executable, os.path.join(HERE, "fake_storefront.py"), "--port", str(sf_port),
+                          "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                          "--error-rate", str(args.error_rate)]),
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(emil_port),
+                          "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+                         cwd=ROOT, env=env),
+    ]
+    try:
+        wait_http(f"{storefront}/stats")
+        base = f"http://127.0.0.1:{emil_port}"
+        wait_http(f"{base}/health")
+        if args.warmup: asyncio.run(run_load(base, corpus, args.warmup, args.concurrency))
+        httpx.post(f"{storefront}/stats/reset")
+        records, wall = asyncio.run(run_load(base, corpus, args.requests, args.concurrency))
+        upstream = httpx.get(f"{storefront}/stats").json()
+        prof = profile(corpus, args.profile_requests, out_path[:-5] + ".prof", args.top) if args.profile_requests else []
+    finally:
+        for p in procs: p.terminate()
+        for p in procs: p.wait(10)
+
+    load = summarize(records, wall)
+    result = {
+        "meta": {"git": rev, "time": stamp, "python": sys.version.split()[0],
+                 "args": {k: v for k, v in vars(args).items() if k not in ("no_save",)}, "corpus": coverage},
+        "load": load,
+        "upstream": {"requests": upstream["requests"], "errors": upstream["errors"]},
+        "profile_top": prof,
+    }
+
+    print(f"{args.requests} Requests, Konkurrenz {args.concurrency}, Storefront {args.latency_ms}±{args.jitter_ms} ms, "
+          f"Fehlerrate {args.error_rate:.0%}")
+    print(f"  {load['rps']} req/s   p50 {load['p50_ms']} ms   p95 {load['p95_ms']} ms   p99 {load['p99_ms']} ms   "
+          f"Fehler {load['errors']}   Upstream-Calls {upstream['requests']}")
+    print(f"  {'Route':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'err':>6}")
+    for route, r in load["routes"].items():
+        print(f"  {route:<18}{r['n']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['errors']:>6}")
+    if prof:
+        print(f"\n  CPU-Profil ({args.profile_requests} Requests in-process), Top {min(10, len(prof))} nach tottime:")
+        for row in prof[:10]:
+            print(f"    {row['tottime_ms']:>9.2f} ms {row['ncalls']:>8}  {row['func']}")
+
+    prev = previous_result(out_path)
+    regressions = compare(prev, result, args.threshold) if prev else []
+    if not args.no_save:
+        with open(out_path, "w", encoding="utf-8") as f: json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nGespeichert: {out_path}")
+    elif args.profile_requests:
+        os.remove(out_path[:-5] + ".prof")
+    return 2 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
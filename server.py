@@ -1,17 +1,55 @@
 # server.py — Emil v1.7 (Gutshof Gin only, + Cocktail-Vorschläge & -Generator)
 
 from __future__ import annotations
-import os, re, json, logging, unicodedata, difflib, random
-from typing import List, Dict, Any, Optional
+import os, sys, re, json, logging, unicodedata, difflib, random, time, asyncio, bisect, zlib, heapq, tempfile, math, hashlib, importlib, marshal, threading
+from collections import OrderedDict, deque
+from functools import lru_cache
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple, FrozenSet, Iterable
 
-import requests
-from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field, PrivateAttr
 
 # ---------- Boot ----------
-load_dotenv()
+# Kaltstart: FastAPI/pydantic braucht jede Instanz sofort, der Rest wird erst beim ersten Zugriff importiert –
+# httpx für Shopify (beim Start im Hintergrund, siehe lifespan), numpy nur für Geschmacks-Vorschläge, sqlite3 nur
+# mit CACHE_BACKEND=sqlite, python-dotenv nur, wenn es überhaupt eine .env gibt.
+class LazyModule:
+    # Platzhalter fürs Modul: importiert beim ersten Attributzugriff und ersetzt sich dann im Modul-Namensraum
+    def __init__(self, name: str, alias: Optional[str] = None):
+        self._name, self._alias = name, alias or name
+
+    def load(self) -> Any:
+        mod = importlib.import_module(self._name)
+        globals()[self._alias] = mod
+        return mod
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+httpx = LazyModule("httpx")
+np = LazyModule("numpy", "np")
+sqlite3 = LazyModule("sqlite3")
+DEFERRED_IMPORTS = {"httpx": "httpx", "numpy": "np", "sqlite3": "sqlite3"}
+
+def find_env_file() -> Optional[str]:
+    # wie dotenv.find_dotenv(): .env neben server.py oder in einem übergeordneten Ordner
+    d = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(d, ".env")
+        if os.path.isfile(path): return path
+        parent = os.path.dirname(d)
+        if parent == d: return None
+        d = parent
+
+ENV_FILE = find_env_file()
+if ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger("emil")
@@ -20,33 +58,426 @@ SHOP_DOMAIN = (os.getenv("SHOPIFY_STOREFRONT_DOMAIN") or "").replace("https://",
 SHOP_TOKEN  = os.getenv("SHOPIFY_STOREFRONT_TOKEN") or ""
 SHOP_URL_BASE = os.getenv("SHOP_URL_BASE") or ""
 SHOP_API_VERSION = os.getenv("SHOPIFY_API_VERSION", "2025-01")
+SHOP_GRAPHQL_URL = os.getenv("SHOPIFY_GRAPHQL_URL") or f"https://{SHOP_DOMAIN}/api/{SHOP_API_VERSION}/graphql.json"  # überschreibbar, z. B. Fake-Storefront im Benchmark
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT","15"))
+PRODUCT_CACHE_TTL   = float(os.getenv("PRODUCT_CACHE_TTL","300"))    # Sekunden frisch
+PRODUCT_CACHE_STALE = float(os.getenv("PRODUCT_CACHE_STALE","3600")) # danach noch so lange stale ausliefern + im Hintergrund erneuern
+PRODUCT_CACHE_MAX   = int(os.getenv("PRODUCT_CACHE_MAX","256"))
+RECIPES_PATH        = os.getenv("RECIPES_PATH","recipes.json")
+RECIPES_CHECK_S     = float(os.getenv("RECIPES_CHECK_S","2"))        # höchstens so oft wird die mtime geprüft
+SHOPIFY_MAX_CONNECTIONS = int(os.getenv("SHOPIFY_MAX_CONNECTIONS","20"))
+SHOPIFY_BUDGET_MS   = int(os.getenv("SHOPIFY_BUDGET_MS","2500"))     # so lange wartet ein /chat max. auf Shopify
+BREAKER_FAILURES    = int(os.getenv("BREAKER_FAILURES","5"))         # Fehler in Folge → Breaker offen
+BREAKER_COOLDOWN    = float(os.getenv("BREAKER_COOLDOWN","30"))      # Sekunden offen, dann ein Probe-Call
+CACHE_BACKEND       = os.getenv("CACHE_BACKEND","memory").lower()    # memory | sqlite (geteilt zwischen Workern)
+CACHE_SQLITE_PATH   = os.getenv("CACHE_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "emil-cache.sqlite3")
+CACHE_LEASE_S       = float(os.getenv("CACHE_LEASE_S","5"))          # so lange warten andere Worker auf einen laufenden Abruf
+RESPONSE_CACHE_MAX  = int(os.getenv("RESPONSE_CACHE_MAX","2048"))    # fertige /chat-Antworten, 0 = aus
+BATCH_MAX           = int(os.getenv("BATCH_MAX","200"))             # max. Nachrichten pro /chat/batch
+METRICS_ENABLED     = os.getenv("METRICS_ENABLED","1") == "1"        # Stufen-Timing für /diag/metrics
+COCKTAIL_SEEDED     = os.getenv("COCKTAIL_SEEDED","1") == "1"        # Cocktail-Namen deterministisch je Anfrage
+CATALOG_SYNC        = os.getenv("CATALOG_SYNC","0") == "1"           # kompletter Katalog lokal statt Suche pro Anfrage
+CATALOG_SYNC_S      = float(os.getenv("CATALOG_SYNC_S","600"))       # Abgleich-Intervall in Sekunden
+CATALOG_PATH        = os.getenv("CATALOG_PATH","catalog_snapshot.json")  # Snapshot für den Warmstart
+CATALOG_PAGE_SIZE   = int(os.getenv("CATALOG_PAGE_SIZE","250"))      # Storefront-Maximum pro Seite
+CATALOG_MAX_PAGES   = int(os.getenv("CATALOG_MAX_PAGES","200"))
+QUERY_LOG_ENABLED   = os.getenv("QUERY_LOG_ENABLED","1") == "1"      # jede /chat-Runde als JSONL-Zeile
+QUERY_LOG_PATH      = os.getenv("QUERY_LOG_PATH","requests.jsonl")
+QUERY_LOG_QUEUE     = int(os.getenv("QUERY_LOG_QUEUE","10000"))      # max. ungeschriebene Einträge, darüber wird verworfen
+QUERY_LOG_BATCH     = int(os.getenv("QUERY_LOG_BATCH","256"))        # Einträge pro Schreibvorgang
+QUERY_LOG_FLUSH_S   = float(os.getenv("QUERY_LOG_FLUSH_S","1"))      # spätestens so oft wird geschrieben
+QUERY_LOG_MAX_MB    = float(os.getenv("QUERY_LOG_MAX_MB","50"))      # danach rotieren: .1, .2, …
+QUERY_LOG_BACKUPS   = int(os.getenv("QUERY_LOG_BACKUPS","3"))
+RATE_LIMIT_RPS      = float(os.getenv("RATE_LIMIT_RPS","0"))         # Token-Bucket pro Client: Nachfüllrate/s, 0 = aus
+RATE_LIMIT_BURST    = float(os.getenv("RATE_LIMIT_BURST","20"))      # Bucket-Größe (kurze Spitzen)
+RATE_LIMIT_CLIENTS  = int(os.getenv("RATE_LIMIT_CLIENTS","10000"))   # so viele Clients werden gemerkt (LRU)
+TRUST_PROXY         = os.getenv("TRUST_PROXY","0") == "1"            # Client = erster Eintrag in X-Forwarded-For
+MAX_INFLIGHT        = int(os.getenv("MAX_INFLIGHT","512"))           # gleichzeitige Chat-Requests, darüber 503
+SHOPIFY_CONCURRENCY = int(os.getenv("SHOPIFY_CONCURRENCY","64"))     # Requests, die gleichzeitig auf Shopify warten dürfen, 0 = unbegrenzt
+SHED_QUEUE_MS       = int(os.getenv("SHED_QUEUE_MS","250"))          # länger auf einen Slot warten → Antwort ohne Produkte
+SHED_UPSTREAM_MS    = int(os.getenv("SHED_UPSTREAM_MS","1500"))      # Shopify im Mittel langsamer + alle Slots belegt → gar nicht erst anstellen
+SESSION_MAX         = int(os.getenv("SESSION_MAX","100000"))         # gemerkte Gespräche (LRU), 0 = aus
+SESSION_TTL_S       = float(os.getenv("SESSION_TTL_S","1800"))       # so lange Leerlauf, dann wird ein Gespräch vergessen
+HTTP_CACHE_STATIC_S = int(os.getenv("HTTP_CACHE_STATIC_S","3600"))   # GET /chat: max-age für Antworten ohne Produkte
+HTTP_CACHE_PRODUCTS_S = int(os.getenv("HTTP_CACHE_PRODUCTS_S","60")) # … und mit Produkten (Preise, Verfügbarkeit)
+STARTUP_SNAPSHOT    = os.getenv("STARTUP_SNAPSHOT","")              # Datei mit vorberechneten Tabellen für den Start, leer = aus
 
 ALLOWED_ORIGINS = [o.strip() for o in (os.getenv("ALLOWED_ORIGINS") or "").split(",") if o.strip()]
 if not ALLOWED_ORIGINS: ALLOWED_ORIGINS = ["*"]
 
-app = FastAPI(title="Emil – Gutshof Gin Bot", version="1.7", docs_url="/docs", redoc_url="/redoc")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # httpx im Hintergrund laden: /health antwortet schon, der erste Shopify-Abruf wartet notfalls auf den Import
+    if SHOP_DOMAIN and SHOP_TOKEN and isinstance(httpx, LazyModule):
+        asyncio.get_running_loop().run_in_executor(None, httpx.load)
+    QUERY_LOG.start()
+    if CATALOG_SYNC: CATALOG.start()
+    RECIPE_STORE.start()
+    INGREDIENT_INDEX.warm()      # erster Bau im Thread statt im ersten Cocktail-Request
+    if RECIPE_STORE.current().extra: FLAVOR_INDEX.warm()    # ohne recipes.json klein – numpy bleibt bis dahin ungeladen
+    yield
+    await CATALOG.stop()
+    await QUERY_LOG.stop()
+    await close_http()
+
+app = FastAPI(title="Emil – Gutshof Gin Bot", version="1.7", docs_url="/docs", redoc_url="/redoc", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=False,
     allow_methods=["POST","GET","OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag","Retry-After"],   # fürs Widget lesbar (Cache-Control ist ohnehin freigegeben)
 )
 
+# ---------- Metriken ----------
+# Histogramme je (Stufe, Route) und Zähler, ausgegeben im Prometheus-Textformat unter /diag/metrics.
+# Gemessen wird mit perf_counter_ns und einer Stopwatch pro Request: ein lap ist ein Zeitstempel plus
+# append, einsortiert wird einmal am Ende. Mit METRICS_ENABLED=0 wird gar keine Stopwatch angelegt.
+# Exponentielle Buckets 2^k ns (≈1 µs … 17 s): der Bucket ist (ns-1).bit_length() – ohne Suche
+LATENCY_BUCKET_EXP = range(10, 35)
+LATENCY_BUCKETS_NS = [1 << k for k in LATENCY_BUCKET_EXP]
+_BUCKET_OF = [min(max(b - LATENCY_BUCKET_EXP[0], 0), len(LATENCY_BUCKETS_NS)) for b in range(65)]
+
+class Histogram:
+    __slots__ = ("counts","sum_ns")
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_NS) + 1)
+        self.sum_ns = 0
+
+    def observe(self, ns: int) -> None:
+        self.counts[_BUCKET_OF[(ns - 1).bit_length()]] += 1
+        self.sum_ns += ns
+
+_now_ns = time.perf_counter_ns
+
+class Stopwatch:
+    # lap() merkt sich nur (Stufe, Zeitstempel); Differenzen werden erst in Metrics.record gebildet
+    __slots__ = ("marks","route")
+    def __init__(self):
+        self.marks: List[Tuple[str, int]] = [("", _now_ns())]
+        self.route = "unknown"
+
+    def lap(self, stage: str) -> None:
+        self.marks.append((stage, _now_ns()))
+
+class Metrics:
+    def __init__(self):
+        self.stages: Dict[Tuple[str, str], Histogram] = {}      # (Stufe, Route) – heißer Pfad, flache Keys
+        self.totals: Dict[str, Histogram] = {}                  # Route → Gesamtdauer
+        self.hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}   # (Metrik, Labels)
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+
+    def observe(self, name: str, labels: Tuple[Tuple[str, str], ...], ns: int) -> None:
+        h = self.hists.get((name, labels))
+        if h is None: h = self.hists[(name, labels)] = Histogram()
+        h.observe(ns)
+
+    def record(self, sw: Stopwatch) -> None:
+        stages, route, bucket_of = self.stages, sw.route, _BUCKET_OF
+        marks = iter(sw.marks)
+        start = last = next(marks)[1]
+        for stage, ts in marks:
+            ns, last = ts - last, ts
+            h = stages.get((stage, route))
+            if h is None: h = stages[(stage, route)] = Histogram()
+            h.counts[bucket_of[(ns - 1).bit_length()]] += 1
+            h.sum_ns += ns
+        h = self.totals.get(route)
+        if h is None: h = self.totals[route] = Histogram()
+        h.observe(last - start)
+
+    def inc(self, name: str, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    @staticmethod
+    def _labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+        parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self, gauges: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]],
+               counters: Optional[Dict[str, Dict[Tuple[Tuple[str, str], ...], float]]] = None) -> str:
+        # counters: monoton steigende Zähler, die andere Komponenten selbst führen (z. B. Query-Log)
+        hists = dict(self.hists)
+        for (stage, route), h in self.stages.items():
+            hists[("emil_stage_seconds", (("stage", stage), ("route", route)))] = h
+        for route, h in self.totals.items():
+            hists[("emil_chat_seconds", (("route", route),))] = h
+        out: List[str] = []
+        for name in sorted({k[0] for k in hists}):
+            out.append(f"# TYPE {name} histogram")
+            for (n, labels), h in sorted(hists.items()):
+                if n != name: continue
+                acc = 0
+                for le, c in zip(LATENCY_BUCKETS_NS + [None], h.counts):
+                    acc += c
+                    le_label = 'le="%s"' % ("+Inf" if le is None else repr(le / 1e9))
+                    out.append(f"{name}_bucket{self._labels(labels, le_label)} {acc}")
+                out.append(f"{name}_sum{self._labels(labels)} {h.sum_ns / 1e9}")
+                out.append(f"{name}_count{self._labels(labels)} {acc}")
+        for name in sorted({k[0] for k in self.counters}):
+            out.append(f"# TYPE {name} counter")
+            for (n, labels), v in sorted(self.counters.items()):
+                if n == name: out.append(f"{name}{self._labels(labels)} {v}")
+        for name, series in (counters or {}).items():
+            out.append(f"# TYPE {name} counter")
+            for labels, v in series.items():
+                out.append(f"{name}{self._labels(labels)} {v}")
+        for name, series in gauges.items():
+            out.append(f"# TYPE {name} gauge")
+            for labels, v in series.items():
+                out.append(f"{name}{self._labels(labels)} {v}")
+        return "\n".join(out) + "\n"
+
+METRICS = Metrics()
+
+# ---------- Query-Log ----------
+# Jede /chat-Runde als eine JSONL-Zeile: ts, q (normalisiert), intent, route, cached, degraded, shopify_ms,
+# total_ms. Der Request hängt den Datensatz nur an eine begrenzte Queue; ein Hintergrund-Task schreibt
+# gebündelt (Datei-I/O im Thread, nicht im Event-Loop) und rotiert nach Größe. Ist die Queue voll, wird
+# verworfen statt zu warten. Mehrere Worker teilen sich die Datei über eine Sperre (<Pfad>.lock).
+# Auswertung: tools/querylog_report.py
+try:
+    import fcntl      # Datei-Sperre zwischen Workern (POSIX); ohne fcntl sollte nur ein Prozess schreiben
+except ImportError:
+    fcntl = None
+
+class QueryLog:
+    def __init__(self, path: str, maxsize: int, batch: int, flush_s: float, max_bytes: int, backups: int):
+        self.path, self.maxsize, self.batch, self.flush_s = path, maxsize, max(1, batch), flush_s
+        self.max_bytes, self.backups = max_bytes, backups
+        self._buf: "deque[Dict[str, Any]]" = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats = {"queued":0,"written":0,"dropped":0,"rotations":0,"write_errors":0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def log(self, rec: Dict[str, Any]) -> None:
+        if len(self._buf) >= self.maxsize:
+            self.stats["dropped"] += 1
+            return
+        self._buf.append(rec)
+        self.stats["queued"] += 1
+        if len(self._buf) >= self.batch and self._wake is not None: self._wake.set()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._closing = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Rest noch wegschreiben
+        if self._task is None: return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+        await self._flush()
+
+    async def _flush(self) -> None:
+        while self._buf:
+            recs = [self._buf.popleft() for _ in range(min(self.batch, len(self._buf)))]
+            data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs).encode("utf-8")
+            try:
+                await asyncio.to_thread(self._write, data)
+                self.stats["written"] += len(recs)
+            except OSError as ex:
+                self.stats["write_errors"] += 1
+                self.stats["dropped"] += len(recs)
+                log.warning("Query-Log nicht schreibbar (%s): %s", self.path, ex)
+
+    def _write(self, data: bytes) -> None:
+        # alle Worker schreiben in dieselbe Datei: Größe prüfen, rotieren und anhängen unter einer gemeinsamen
+        # Sperre – sonst rotieren zwei Worker an der Grenze doppelt und schieben das echte Log zu früh nach .2
+        with open(f"{self.path}.lock", "ab") as lock:
+            if fcntl is not None: fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size and size + len(data) > self.max_bytes: self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def _rotate(self) -> None:
+        if self.backups <= 0:
+            os.remove(self.path)
+        else:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.stats["rotations"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "enabled": self.enabled, "path": self.path, "pending": len(self._buf),
+                "running": self._task is not None}
+
+QUERY_LOG = QueryLog(QUERY_LOG_PATH, QUERY_LOG_QUEUE if QUERY_LOG_ENABLED else 0, QUERY_LOG_BATCH,
+                     QUERY_LOG_FLUSH_S, int(QUERY_LOG_MAX_MB * 1024 * 1024), QUERY_LOG_BACKUPS)
+
+# ---------- Start-Snapshot ----------
+# Tabellen, die beim Import aus den Konstanten dieser Datei entstehen (Normalisierungs-Tabelle, Teilstring- und
+# Fuzzy-Tabellen des Intent-Matchers, Klassiker-Reihenfolge je Edition), kann eine neue Instanz aus
+# STARTUP_SNAPSHOT laden statt sie neu zu rechnen – und braucht dafür auch numpy nicht. Der Schlüssel
+# (Format, Hash von server.py, Python, Unicode-Version) muss passen; sonst (oder fehlt/ist kaputt) wird wie immer
+# gebaut und die Datei danach atomar neu geschrieben. Gleiches Image → die erste Instanz schreibt, alle weiteren
+# laden; alternativ beim Build einmal `STARTUP_SNAPSHOT=… python -c "import server"`. Regexe kompiliert jede
+# Instanz selbst (re hat keinen prozessübergreifenden Cache), recipes.json lädt RECIPE_STORE wie bisher.
+# Inhalt ist marshal (nur dict/list/tuple/frozenset/str/int) statt pickle, führt beim Laden also keinen Code
+# aus – sicher gegen kaputte oder bösartige Daten ist marshal aber nicht (kann den Interpreter abstürzen lassen).
+# Deshalb: Datei nur von der Service-Kennung beschreibbar (sonst wird sie ignoriert und neu gebaut), geschrieben
+# mit 0600, und vor marshal.loads werden Kopf, Länge und Prüfsumme (blake2b, Schlüssel = Hash von server.py)
+# geprüft – das fängt abgeschnittene, kaputte und fremde Dateien ab, ist aber keine Signatur.
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_MAGIC = b"EMILSNAP"
+with open(__file__, "rb") as _f: SOURCE_DIGEST = hashlib.blake2b(_f.read(), digest_size=16).digest()
+
+class StartupSnapshot:
+    def __init__(self, path: str):
+        self.path = path
+        self.key = {"format": SNAPSHOT_FORMAT, "source": SOURCE_DIGEST.hex(),
+                    "python": sys.implementation.cache_tag, "unicode": unicodedata.unidata_version}
+        self.parts: Dict[str, Any] = {}       # aus der Datei
+        self.built: Dict[str, Any] = {}       # in diesem Start neu gerechnet → save()
+        self.status = "off" if not path else "missing"
+        self.load_ms = self.save_ms = 0.0
+        if path: self._load()
+
+    @staticmethod
+    def _digest(payload: bytes) -> bytes:
+        return hashlib.blake2b(payload, digest_size=16, key=SOURCE_DIGEST).digest()
+
+    def _read(self) -> Any:
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (hasattr(os, "getuid") and st.st_uid != os.getuid()) or st.st_mode & 0o022:
+                raise ValueError("gehört nicht dem Service oder ist für andere beschreibbar")
+            raw = f.read()
+        head = len(SNAPSHOT_MAGIC) + 8 + 16
+        if len(raw) < head or not raw.startswith(SNAPSHOT_MAGIC): raise ValueError("kein Start-Snapshot")
+        size = int.from_bytes(raw[len(SNAPSHOT_MAGIC):len(SNAPSHOT_MAGIC) + 8], "little")
+        payload = raw[head:]
+        if len(payload) != size: raise ValueError("Länge passt nicht")
+        if self._digest(payload) != raw[head - 16:head]: raise ValueError("Prüfsumme passt nicht")
+        return marshal.loads(payload)
+
+    def _load(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            data = self._read()
+        except FileNotFoundError:
+            return
+        except Exception as ex:
+            log.warning("Start-Snapshot %s nicht lesbar: %s", self.path, ex)
+            self.status = "error"
+            return
+        if not isinstance(data, dict) or data.get("key") != self.key or not isinstance(data.get("parts"), dict):
+            self.status = "stale"
+            log.info("Start-Snapshot %s veraltet, wird neu gebaut", self.path)
+            return
+        self.parts, self.status = data["parts"], "loaded"
+        self.load_ms = (time.perf_counter() - t0) * 1000
+
+    def get(self, name: str, build: Callable[[], Any]) -> Any:
+        # Teil aus dem Snapshot, sonst bauen (und beim nächsten save() mitschreiben)
+        if name in self.parts: return self.parts[name]
+        value = self.built[name] = build()
+        return value
+
+    def save(self) -> None:
+        if not self.path or not self.built: return
+        t0 = time.perf_counter()
+        tmp = None
+        try:
+            payload = marshal.dumps({"key": self.key, "parts": {**self.parts, **self.built}})
+            fd, tmp = tempfile.mkstemp(prefix=".emil-snapshot-", dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(fd, "wb") as f:
+                f.write(SNAPSHOT_MAGIC + len(payload).to_bytes(8, "little") + self._digest(payload) + payload)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)   # parallel startende Worker sehen nur fertige Dateien
+        except OSError as ex:
+            log.warning("Start-Snapshot %s nicht schreibbar: %s", self.path, ex)
+            if tmp and os.path.exists(tmp): os.unlink(tmp)
+            return
+        self.save_ms = (time.perf_counter() - t0) * 1000
+        log.info("Start-Snapshot geschrieben: %s (%s)", self.path, ", ".join(self.built))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": self.path or None, "status": self.status, "parts": sorted(self.parts), "built": sorted(self.built),
+                "load_ms": round(self.load_ms, 3), "save_ms": round(self.save_ms, 3), "key": self.key}
+
+STARTUP = StartupSnapshot(STARTUP_SNAPSHOT)
+
 # ---------- Utils: Normalisierung ----------
+# norm() wirkt zeichenweise: Digraphen, lower(), NFKD ohne Combining-Zeichen, alles außer [a-z0-9] → Leerzeichen,
+# zum Schluss Leerzeichen zusammenfassen. Das Ergebnis eines Zeichens hängt nicht von seinen Nachbarn ab, also
+# reicht eine Tabelle pro Zeichen: ASCII über 256 Bytes (bytes.translate), Umlaute über to_ascii_digraphs, der
+# Rest über NORM_TABLE (Latin/Interpunktion vorberechnet, sonst einmal pro Zeichen). Kurze Eingaben werden
+# zusätzlich gememot. Gleichheit mit der alten Kette prüft bench/bench_norm.py.
+NORM_MEMO_SIZE   = 8192   # Einträge im Memo (LRU)
+NORM_MEMO_MAXLEN = 256    # längere Eingaben (Freitext, Katalog) gehen am Memo vorbei
+NORM_TABLE_MAX   = 65536  # so viele Zeichen merkt sich NORM_TABLE höchstens
+
 def to_ascii_digraphs(s: str) -> str:
+    if s.isascii(): return s
     return (s.replace("Ä","Ae").replace("Ö","Oe").replace("Ü","Ue")
              .replace("ä","ae").replace("ö","oe").replace("ü","ue")
              .replace("ß","ss"))
 
+_NORM_ASCII = bytes(ord(c) if c.isalnum() else 32 for c in (chr(i).lower() for i in range(128))) + b" " * 128
+_NORM_KEEP = frozenset("abcdefghijklmnopqrstuvwxyz0123456789")
+
+def norm_char(c: str) -> str:
+    # ein Zeichen durch die komplette Kette (ohne das Zusammenfassen der Leerzeichen)
+    d = unicodedata.normalize("NFKD", to_ascii_digraphs(c).lower())
+    return "".join(x if x in _NORM_KEEP else " " for x in d if not unicodedata.combining(x))
+
+class NormTable(dict):
+    # Codepoint → norm_char; str.translate fragt fehlende Zeichen über __missing__ nach
+    def __missing__(self, cp: int) -> str:
+        v = norm_char(chr(cp))
+        if len(self) < NORM_TABLE_MAX: self[cp] = v
+        return v
+
+NORM_TABLE = NormTable(STARTUP.get("norm_table", lambda: {
+    cp: norm_char(chr(cp)) for r in (range(0x80, 0x250), range(0x2000, 0x2070)) for cp in r}))
+
+def _norm(s: str) -> str:
+    if not s.isascii():
+        s = to_ascii_digraphs(s)
+        if not s.isascii(): s = s.translate(NORM_TABLE)
+    return " ".join(s.encode("ascii").translate(_NORM_ASCII).decode("ascii").split())
+
+_norm_memo = lru_cache(maxsize=NORM_MEMO_SIZE)(_norm)
+
 def norm(s: str) -> str:
-    s = to_ascii_digraphs(s).lower().strip()
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(c for c in s if not unicodedata.combining(c))
-    s = re.sub(r"[^a-z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return _norm_memo(s) if len(s) <= NORM_MEMO_MAXLEN else _norm(s)
+
+def norm_many(items: Iterable[str]) -> List[str]:
+    # für Index-Aufbau und Auswertungen: am Memo vorbei (verdrängt keine heißen Chat-Nachrichten),
+    # Wiederholungen innerhalb des Aufrufs (Tags, Gins) werden nur einmal berechnet
+    seen: Dict[str, str] = {}
+    out = []
+    for s in items:
+        v = seen.get(s)
+        if v is None: v = seen[s] = _norm(s)
+        out.append(v)
+    return out
 
 # ---------- Domain Guard (nur Gin) ----------
 GIN_KEYWORDS = [
@@ -55,12 +486,11 @@ GIN_KEYWORDS = [
     "botanicals","tonic","cocktail","longdrink","martini","negroni","collins",
     "geschenk","foodpairing","pairing","versand","alkohol","abv","prozent","inhalt","rezept","zutaten"
 ]
+OFF_TOPIC_PATTERNS = [r"\b(bank|passwort|bitcoin|steuer|recht|medizin|dating|politik|wetter|fussball|fußball)\b",
+                      r"\b(hack|exploit|illegal|waffe|drogen)\b"]
+
 def is_on_topic(q: str) -> bool:
-    nq = norm(q)
-    if any(k in nq for k in [norm(k) for k in GIN_KEYWORDS]): return True
-    off = [r"\b(bank|passwort|bitcoin|steuer|recht|medizin|dating|politik|wetter|fussball|fußball)\b",
-           r"\b(hack|exploit|illegal|waffe|drogen)\b"]
-    return not any(re.search(p, nq) for p in off)
+    return ROUTER.test("on_topic", norm(q))
 
 # ---------- Intents ----------
 CATS = ["rotkaeppchen","froschkoenig","aschenputtel","sterntaler","classic","limetta","mandarina","rosata"]
@@ -76,22 +506,96 @@ KEYWORDS = {
 }
 ALIASES = {"rotkapchen":"rotkaeppchen","rotkapp":"rotkaeppchen","rotkaep":"rotkaeppchen"}
 
+# Einmal beim Start kompiliert, liefert exakt dieselben Ergebnisse wie die frühere Schleifen-Kaskade:
+#  1. Alias (ganze Anfrage)
+#  2. Keyword als Teilstring – eine Regex-Alternation mit Lookahead findet alle (auch überlappende)
+#     Treffer in einem Scan; gewinnt die erste Kategorie in KEYWORDS-Reihenfolge
+#  3. Token als Teilstring eines Keywords – Lookup in einer vorberechneten Teilstring-Tabelle
+#  4. Fuzzy wie difflib.get_close_matches(cutoff=0.72); Kandidaten nach Länge vorsortiert, denn
+#     ratio ≤ 2·min(la,lb)/(la+lb) – lange Sätze scheiden so ohne einen einzigen Vergleich aus
+class IntentMatcher:
+    def __init__(self, keywords: Dict[str, List[str]], aliases: Dict[str, str], cutoff: float = 0.72,
+                 tables: Optional[Tuple[Dict[str, str], Dict[str, str], List[Tuple[int, int, str, frozenset]]]] = None):
+        # tables = fertige tables(keywords), z. B. aus dem Start-Snapshot
+        self.aliases, self.cutoff = dict(aliases), cutoff
+        self.cats = list(keywords)
+        self._rx = re.compile("(?=" + "|".join(
+            f"(?P<c{i}>" + "|".join(re.escape(kw) for kw in kws) + ")" for i, kws in enumerate(keywords.values())
+        ) + ")")
+        self._substr, self._kw_cat, self._fuzzy = tables or self.tables(keywords)
+        self._fuzzy_lens = [f[0] for f in self._fuzzy]
+
+    @classmethod
+    def tables(cls, keywords: Dict[str, List[str]]) -> Tuple[Dict[str, str], Dict[str, str], List[Tuple[int, int, str, frozenset]]]:
+        # (Teilstring → Kategorie, Keyword → Kategorie, Fuzzy-Kandidaten)
+        substr: Dict[str, str] = {}
+        kw_cat: Dict[str, str] = {}
+        for cat, kws in keywords.items():
+            for kw in kws:
+                kw_cat.setdefault(kw, cat)
+                for i in range(len(kw)):
+                    for j in range(i + 1, len(kw) + 1):
+                        substr.setdefault(kw[i:j], cat)
+        # (Länge, Position, Keyword, Zeichenhäufigkeiten), nach Länge sortiert
+        all_kws = [k for ks in keywords.values() for k in ks]
+        return substr, kw_cat, sorted(((len(k), i, k, cls._counts(k)) for i, k in enumerate(all_kws)))
+
+    @staticmethod
+    def _counts(s: str) -> frozenset:
+        # Multimenge als Menge von (Zeichen, n) – Schnittmengen-Größe = Summe der min. Häufigkeiten
+        seen: Dict[str, int] = {}
+        out = []
+        for ch in s:
+            seen[ch] = seen.get(ch, 0) + 1
+            out.append((ch, seen[ch]))
+        return frozenset(out)
+
+    def match(self, nq: str) -> Optional[str]:
+        if nq in self.aliases: return self.aliases[nq]
+        best = None
+        for m in self._rx.finditer(nq):
+            i = int(m.lastgroup[1:])
+            if best is None or i < best:
+                best = i
+                if i == 0: break
+        if best is not None: return self.cats[best]
+        for t in nq.split():
+            cat = self._substr.get(t)
+            if cat: return cat
+        mk = self._close_match(nq)
+        return self._kw_cat[mk] if mk is not None else None
+
+    def _close_match(self, nq: str) -> Optional[str]:
+        la, c = len(nq), self.cutoff
+        # Längenfenster großzügig (±1) – die exakte Prüfung folgt unten mit denselben Formeln wie difflib
+        lo = bisect.bisect_left(self._fuzzy_lens, la * c / (2 - c) - 1)
+        hi = bisect.bisect_right(self._fuzzy_lens, la * (2 - c) / c + 1)
+        if lo >= hi: return None
+        qc = self._counts(nq)
+        cands = []
+        for lb, _, kw, kc in self._fuzzy[lo:hi]:
+            if 2.0 * min(la, lb) / (la + lb) < c: continue
+            # quick_ratio: obere Schranke für ratio
+            ub = 2.0 * len(kc & qc) / (la + lb)
+            if ub >= c: cands.append((ub, kw))
+        if not cands: return None
+        # Branch & Bound: nach Schranke absteigend prüfen; liegt die Schranke unter dem besten
+        # Treffer, kann kein späterer Kandidat mehr gewinnen (Gleichstand → größeres Keyword, wie nlargest)
+        cands.sort(reverse=True)
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(nq)
+        best = None
+        for ub, kw in cands:
+            if best is not None and ub < best[0]: break
+            sm.set_seq1(kw)
+            r = sm.ratio()
+            if r >= c and (best is None or (r, kw) > best): best = (r, kw)
+        return best[1] if best else None
+
+INTENT_MATCHER = IntentMatcher(KEYWORDS, ALIASES, tables=STARTUP.get("intent_tables", lambda: IntentMatcher.tables(KEYWORDS)))
+
 def extract_intent(q: str) -> Optional[str]:
-    nq = norm(q)
-    if nq in ALIASES: return ALIASES[nq]
-    for cat, kws in KEYWORDS.items():
-        for kw in kws:
-            if kw in nq: return cat
-    for t in nq.split():
-        for cat, kws in KEYWORDS.items():
-            if any(kw == t or kw in t or t in kw for kw in kws): return cat
-    all_kws = [k for ks in KEYWORDS.values() for k in ks]
-    m = difflib.get_close_matches(nq, all_kws, n=1, cutoff=0.72)
-    if m:
-        mk = m[0]
-        for cat, ks in KEYWORDS.items():
-            if mk in ks: return cat
-    return None
+    return INTENT_MATCHER.match(norm(q))
 
 # ---------- Rezepte, Pairings, Klassiker ----------
 RECIPES_BUILTIN = [
@@ -145,11 +649,79 @@ FAQS = {
 SUGGESTIONS_DEFAULT = ["Zeig Rotkäppchen","Foodpairing Classic","Rezept mit Froschkönig","Geschenkideen","Cocktail-Ideen"]
 
 # ---------- Shopify ----------
-def shopify_search_by_title(fragment: str) -> List[Dict[str, Any]]:
-    if not SHOP_DOMAIN or not SHOP_TOKEN:
-        log.warning("Shopify nicht konfiguriert.")
-        return []
-    url = f"https://{SHOP_DOMAIN}/api/{SHOP_API_VERSION}/graphql.json"
+# Ein gemeinsamer AsyncClient für alle Requests → Keep-Alive, keine neue TLS-Verbindung pro Chat.
+_http: Optional[httpx.AsyncClient] = None
+
+def get_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=SHOPIFY_MAX_CONNECTIONS, max_keepalive_connections=SHOPIFY_MAX_CONNECTIONS),
+        )
+    return _http
+
+async def close_http() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+class CircuitOpen(Exception):
+    pass
+
+# Circuit Breaker: nach BREAKER_FAILURES Fehlern/Timeouts in Folge wird Shopify für BREAKER_COOLDOWN
+# Sekunden nicht mehr gefragt (sofortiger Fallback), danach darf genau ein Probe-Call durch.
+class CircuitBreaker:
+    def __init__(self, failures: int, cooldown: float, slow_s: float):
+        self.failures, self.cooldown, self.slow_s = failures, cooldown, slow_s
+        self.fails = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.stats = {"calls":0,"failures":0,"slow":0,"short_circuited":0,"opened":0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None: return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        st = self.state
+        if st == "closed": return True
+        if st == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        self.stats["short_circuited"] += 1
+        return False
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        self.stats["calls"] += 1
+        if ok and elapsed > self.slow_s:
+            self.stats["slow"] += 1
+            ok = False
+        self.probing = False
+        if ok:
+            self.fails, self.opened_at = 0, None
+            return
+        self.stats["failures"] += 1
+        self.fails += 1
+        if self.fails >= self.failures or self.opened_at is not None:
+            if self.opened_at is None: self.stats["opened"] += 1
+            self.opened_at = time.monotonic()
+
+    def cancel(self) -> None:
+        # Call abgebrochen (Latenzbudget, Client weg, Shutdown): kein Ergebnis – aber ein abgebrochener Probe-Call
+        # darf den Breaker nicht für immer halb offen lassen, der nächste Call probt neu
+        self.probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "state": self.state, "consecutive_failures": self.fails}
+
+SHOPIFY_BREAKER = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN, SHOPIFY_BUDGET_MS / 1000)
+
+async def shopify_fetch_by_title(fragment: str) -> List[Dict[str, Any]]:
+    # roher Storefront-Call – wirft bei Fehlern (der Cache entscheidet, was dann ausgeliefert wird)
+    url = SHOP_GRAPHQL_URL
     headers = {"Content-Type":"application/json","X-Shopify-Storefront-Access-Token": SHOP_TOKEN}
     gql = """
     query($q: String!) {
@@ -165,64 +737,869 @@ def shopify_search_by_title(fragment: str) -> List[Dict[str, Any]]:
     }
     """
     variables = {"q": f"title:{fragment} OR tag:{fragment}"}
+    if not SHOPIFY_BREAKER.allow():
+        raise CircuitOpen(fragment)
+    t0 = time.perf_counter_ns()
     try:
-        r = requests.post(url, headers=headers, json={"query": gql, "variables": variables}, timeout=HTTP_TIMEOUT)
+        r = await get_http().post(url, headers=headers, json={"query": gql, "variables": variables})
+        if METRICS_ENABLED: METRICS.inc("emil_shopify_requests_total", status=str(r.status_code))
         r.raise_for_status()
         data = r.json()
-        items = []
-        for e in (data.get("data",{}).get("products",{}).get("edges") or []):
-            n = e["node"]
-            price_edge = (n.get("variants",{}).get("edges") or [{}])[0].get("node",{})
-            price = price_edge.get("price",{})
-            img_edge = (n.get("images",{}).get("edges") or [{}])[0].get("node",{})
-            items.append({
-                "title": n.get("title"),
-                "url": f"{SHOP_URL_BASE}/products/{n.get('handle')}" if SHOP_URL_BASE else "",
-                "image": img_edge.get("url") or "",
-                "price": price.get("amount"),
-                "currency": price.get("currencyCode") or "EUR"
-            })
-        return items
+    except asyncio.CancelledError:
+        SHOPIFY_BREAKER.cancel()
+        raise
     except Exception as ex:
-        log.exception("Shopify search error: %s", ex)
-        return []
-
-def find_products_for_intent(intent: str) -> List[Dict[str, Any]]:
-    frag = {
-        "rotkaeppchen":"Rotkäppchen","froschkoenig":"Froschkönig","aschenputtel":"Aschenputtel",
-        "sterntaler":"Sterntaler","classic":"Classic","limetta":"Limetta","mandarina":"Mandarina","rosata":"Rosata"
-    }.get(intent,intent)
-    items = shopify_search_by_title(frag)
-    if not items and SHOP_URL_BASE:
-        items = [{"title": frag,"url": f"{SHOP_URL_BASE}/search?q={frag}","image":"","price":"","currency":"EUR"}]
-    return items
+        dt = time.perf_counter_ns() - t0
+        SHOPIFY_BREAKER.record(False, dt / 1e9)
+        if METRICS_ENABLED:
+            METRICS.inc("emil_shopify_errors_total", type=type(ex).__name__)
+            METRICS.observe("emil_shopify_seconds", (("outcome","error"),), dt)
+        raise
+    dt = time.perf_counter_ns() - t0
+    SHOPIFY_BREAKER.record(True, dt / 1e9)
+    if METRICS_ENABLED: METRICS.observe("emil_shopify_seconds", (("outcome","ok"),), dt)
+    return [product_card(e["node"]) for e in (data.get("data",{}).get("products",{}).get("edges") or [])]
 
-# ---------- Rezepte-Lookup ----------
-def load_extra_recipes() -> List[Dict[str, Any]]:
+def product_card(n: Dict[str, Any]) -> Dict[str, Any]:
+    # Storefront-Node → ProductCard-Felder
+    price_edge = (n.get("variants",{}).get("edges") or [{}])[0].get("node",{})
+    price = price_edge.get("price",{})
+    img_edge = (n.get("images",{}).get("edges") or [{}])[0].get("node",{})
+    return {
+        "title": n.get("title"),
+        "url": f"{SHOP_URL_BASE}/products/{n.get('handle')}" if SHOP_URL_BASE else "",
+        "image": img_edge.get("url") or "",
+        "price": price.get("amount"),
+        "currency": price.get("currencyCode") or "EUR"
+    }
+
+def content_digest(obj: Any) -> int:
+    # stabiler Inhalts-Hash (unabhängig von Prozess und Dict-Reihenfolge) für ETags
+    return zlib.crc32(json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",",":")).encode("utf-8"))
+
+# ---------- Cache-Backends ----------
+# Gleiche Schnittstelle für den prozesslokalen Speicher und einen zwischen uvicorn-Workern geteilten
+# SQLite-Cache (WAL, lokale Datei, kein externer Dienst). Einträge sind (stored_at, Wert) mit Wanduhrzeit,
+# verdrängt wird nach Alter (max_age) und Anzahl (ältester Eintrag zuerst). acquire/release sind eine
+# Lease über Prozesse hinweg: nur wer sie hat, fragt upstream, die anderen warten auf dessen Ergebnis –
+# scheitert er, hinterlässt er per fail() eine Fehlermarke, und die Wartenden geben sofort auf (poll()).
+# SQLite blockiert (Datei-I/O, bis zu busy_ms Wartezeit auf Sperren) → ProductCache ruft das geteilte Backend
+# nur per asyncio.to_thread auf; die eine Verbindung pro Prozess ist dafür per Lock serialisiert.
+class MemoryCache:
+    shared = False
+
+    def __init__(self, maxsize: int, max_age: float):
+        self.maxsize, self.max_age = maxsize, max_age
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {"evictions":0,"expired":0}
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        e = self._data.get(key)
+        if e is not None and time.time() - e[0] >= self.max_age:
+            del self._data[key]
+            self.stats["expired"] += 1
+            return None
+        return e
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> Tuple[float, Any]:
+        e = self._data[key] = (time.time() if stored_at is None else stored_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+        return e
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def acquire(self, key: str, lease_s: float) -> bool:
+        return True   # innerhalb eines Prozesses koalesziert bereits ProductCache._inflight
+
+    def release(self, key: str) -> None:
+        pass
+
+    def fail(self, key: str) -> None:
+        pass
+
+    def poll(self, key: str) -> Tuple[Optional[Tuple[float, Any]], float]:
+        return self.get(key), 0.0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": "memory", "entries": len(self._data), "maxsize": self.maxsize}
+
+class SQLiteCache:
+    shared = True
+
+    def __init__(self, path: str, namespace: str, maxsize: int, max_age: float, busy_ms: int = 200):
+        self.path, self.ns, self.maxsize, self.max_age, self.busy_ms = path, namespace, maxsize, max_age, busy_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+        self.stats = {"reads":0,"writes":0,"evictions":0,"leases":0,"lease_waits":0,"errors":0}
+
+    def _db(self) -> sqlite3.Connection:
+        # eine Verbindung pro Prozess (Worker werden geforkt/gespawnt)
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_ms / 1000, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (ns TEXT, key TEXT, stored_at REAL, value TEXT, PRIMARY KEY (ns, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_age ON cache (ns, stored_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (ns TEXT, key TEXT, owner INTEGER, expires REAL, PRIMARY KEY (ns, key))")
+            conn.execute("CREATE TABLE IF NOT EXISTS failures (ns TEXT, key TEXT, at REAL, PRIMARY KEY (ns, key))")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _safe(self, default: Any, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        # ein kaputter/gesperrter Cache darf nie einen Chat kosten → wie ein Miss behandeln
+        try:
+            with self._lock: return fn(self._db())
+        except sqlite3.Error as ex:
+            self.stats["errors"] += 1
+            log.warning("SQLite-Cache %s: %s", self.path, ex)
+            return default
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        self.stats["reads"] += 1
+        row = self._safe(None, lambda db: db.execute("SELECT stored_at, value FROM cache WHERE ns=? AND key=? AND stored_at > ?",
+                                                     (self.ns, key, time.time() - self.max_age)).fetchone())
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> Tuple[float, Any]:
+        e = (time.time() if stored_at is None else stored_at, value)
+        def write(db: sqlite3.Connection) -> None:
+            db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?)", (self.ns, key, e[0], json.dumps(value, ensure_ascii=False)))
+            n = db.execute("DELETE FROM cache WHERE ns=? AND stored_at <= ?", (self.ns, e[0] - self.max_age)).rowcount
+            n += db.execute("DELETE FROM cache WHERE ns=? AND key IN (SELECT key FROM cache WHERE ns=? ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                            (self.ns, self.ns, self.maxsize)).rowcount
+            self.stats["writes"] += 1
+            self.stats["evictions"] += n
+        self._safe(None, write)
+        return e
+
+    def delete(self, key: str) -> None:
+        self._safe(None, lambda db: db.execute("DELETE FROM cache WHERE ns=? AND key=?", (self.ns, key)))
+
+    def clear(self) -> None:
+        self._safe(None, lambda db: db.execute("DELETE FROM cache WHERE ns=?", (self.ns,)))
+
+    def acquire(self, key: str, lease_s: float) -> bool:
+        def take(db: sqlite3.Connection) -> bool:
+            now = time.time()
+            db.execute("DELETE FROM leases WHERE ns=? AND key=? AND expires < ?", (self.ns, key, now))
+            return db.execute("INSERT OR IGNORE INTO leases VALUES (?,?,?,?)", (self.ns, key, os.getpid(), now + lease_s)).rowcount == 1
+        ok = self._safe(True, take)   # ohne Datenbank: selbst abrufen
+        self.stats["leases" if ok else "lease_waits"] += 1
+        return ok
+
+    def release(self, key: str) -> None:
+        self._safe(None, lambda db: db.execute("DELETE FROM leases WHERE ns=? AND key=? AND owner=?", (self.ns, key, os.getpid())))
+
+    def fail(self, key: str) -> None:
+        # Lease-Inhaber ist upstream gescheitert (Fehler, Breaker offen) → Zeitpunkt für die Wartenden
+        self._safe(None, lambda db: db.execute("INSERT OR REPLACE INTO failures VALUES (?,?,?)", (self.ns, key, time.time())))
+
+    def poll(self, key: str) -> Tuple[Optional[Tuple[float, Any]], float]:
+        # (Eintrag wie get(), Zeitpunkt der letzten Fehlermarke oder 0)
+        row = self._safe(None, lambda db: db.execute("SELECT at FROM failures WHERE ns=? AND key=?", (self.ns, key)).fetchone())
+        return self.get(key), row[0] if row else 0.0
+
+    def __len__(self) -> int:
+        return self._safe(0, lambda db: db.execute("SELECT COUNT(*) FROM cache WHERE ns=?", (self.ns,)).fetchone()[0])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": "sqlite", "path": self.path, "entries": len(self), "maxsize": self.maxsize}
+
+def make_cache(namespace: str, maxsize: int, max_age: float) -> "MemoryCache | SQLiteCache":
+    if CACHE_BACKEND == "sqlite": return SQLiteCache(CACHE_SQLITE_PATH, namespace, maxsize, max_age)
+    if CACHE_BACKEND != "memory": log.warning("Unbekanntes CACHE_BACKEND=%s – nutze memory", CACHE_BACKEND)
+    return MemoryCache(maxsize, max_age)
+
+# ---------- Produkt-Cache ----------
+# Nur 8 Editionen → immer dieselben Suchfragmente. Der Cache hält Ergebnisse pro Fragment:
+#  - frisch (< TTL): direkt ausliefern
+#  - stale (< TTL + STALE): ausliefern und im Hintergrund genau einmal erneuern
+#  - Miss: gleichzeitige Anfragen für dasselbe Fragment teilen sich einen Upstream-Call
+# Mit geteiltem Backend hält jeder Worker zusätzlich eine lokale Kopie; erst wenn die nicht mehr frisch ist,
+# wird im Backend nachgesehen, und upstream fragt pro Fragment nur der Worker mit der Lease.
+class LeaseFailed(Exception):
+    pass
+
+class ProductCache:
+    def __init__(self, loader: Callable[[str], Awaitable[List[Dict[str, Any]]]], ttl: float, stale: float, maxsize: int,
+                 backend: "MemoryCache | SQLiteCache | None" = None, lease_s: float = 5.0):
+        self.loader, self.ttl, self.stale, self.maxsize, self.lease_s = loader, ttl, stale, maxsize, lease_s
+        self._local = MemoryCache(maxsize, ttl + stale)
+        self.backend = backend if backend is not None and backend.shared else None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._digests: Dict[str, Tuple[List[Dict[str, Any]], int]] = {}
+        self.version = 0  # steigt, sobald sich ein gecachtes Ergebnis inhaltlich ändert
+        self.stats = {"hits":0,"stale_hits":0,"misses":0,"coalesced":0,"refreshes":0,"errors":0,"shared_hits":0,"upstream":0}
+
+    def _adopt(self, fragment: str, e: Tuple[float, List[Dict[str, Any]]]) -> None:
+        old = self._local.get(fragment)
+        if old is None or old[1] != e[1]: self.version += 1
+        self._local.set(fragment, e[1], e[0])
+
+    async def _shared(self, method: str, *args: Any) -> Any:
+        # Backend-Aufruf im Thread: SQLite-I/O und Sperr-Wartezeit nicht auf dem Event-Loop
+        return await asyncio.to_thread(getattr(self.backend, method), *args)
+
+    async def _entry(self, fragment: str, now: float) -> Optional[Tuple[float, List[Dict[str, Any]]]]:
+        hit = self._local.get(fragment)
+        if self.backend is not None and (hit is None or now - hit[0] >= self.ttl):
+            shared = await self._shared("get", fragment)
+            if shared is not None and (hit is None or shared[0] > hit[0]):
+                self.stats["shared_hits"] += 1
+                self._adopt(fragment, shared)
+                hit = shared
+        return hit
+
+    def is_fresh(self, fragment: str) -> bool:
+        hit = self._local.get(fragment)
+        return bool(hit) and time.time() - hit[0] < self.ttl
+
+    def digest(self, fragment: str) -> Optional[int]:
+        # Inhalts-Hash der lokalen Kopie (None = noch nichts da); je Listen-Objekt nur einmal berechnet
+        hit = self._local.get(fragment)
+        if hit is None: return None
+        d = self._digests.get(fragment)
+        if d is None or d[0] is not hit[1]:
+            d = self._digests[fragment] = (hit[1], content_digest(hit[1]))
+            if len(self._digests) > self.maxsize: self._digests.pop(next(iter(self._digests)))
+        return d[1]
+
+    def is_cached(self, fragment: str) -> bool:
+        # liefert get() sofort (frisch oder stale), ohne auf Shopify zu warten?
+        hit = self._local.get(fragment)
+        return bool(hit) and time.time() - hit[0] < self.ttl + self.stale
+
+    async def get(self, fragment: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        hit = await self._entry(fragment, now)
+        if hit and now - hit[0] < self.ttl:
+            self.stats["hits"] += 1
+            return hit[1]
+        if hit and now - hit[0] < self.ttl + self.stale:
+            self.stats["stale_hits"] += 1
+            if fragment not in self._inflight:
+                self.stats["refreshes"] += 1
+                self._inflight[fragment] = asyncio.create_task(self._load(fragment))
+            return hit[1]
+        task = self._inflight.get(fragment)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = self._inflight[fragment] = asyncio.create_task(self._load(fragment))
+        # shield: bricht ein Aufrufer wegen Latenzbudget ab, läuft der gemeinsame Call für die anderen weiter
+        return await asyncio.shield(task)
+
+    async def _from_other_worker(self, fragment: str, asked: float) -> Optional[List[Dict[str, Any]]]:
+        # ein anderer Worker hat die Lease → auf sein Ergebnis im Backend warten (höchstens lease_s);
+        # Fehlermarke nach unserem acquire (asked) → er ist gescheitert, nicht weiter warten
+        old = self._local.get(fragment)
+        since = old[0] if old else 0.0
+        end = time.monotonic() + self.lease_s
+        while time.monotonic() < end:
+            await asyncio.sleep(0.02)
+            e, failed = await self._shared("poll", fragment)
+            if e is not None and e[0] > since:
+                self.stats["shared_hits"] += 1
+                self._adopt(fragment, e)
+                return e[1]
+            if failed >= asked: raise LeaseFailed(fragment)
+        return None
+
+    async def _load(self, fragment: str) -> List[Dict[str, Any]]:
+        leased = False
+        try:
+            if self.backend is not None:
+                asked = time.time()
+                leased = await self._shared("acquire", fragment, self.lease_s)
+                if not leased:
+                    items = await self._from_other_worker(fragment, asked)
+                    if items is not None: return items
+                else:
+                    # Lease frisch bekommen – hat ein anderer Worker gerade eben schon geschrieben?
+                    e = await self._shared("get", fragment)
+                    if e is not None and time.time() - e[0] < self.ttl:
+                        self.stats["shared_hits"] += 1
+                        self._adopt(fragment, e)
+                        return e[1]
+            self.stats["upstream"] += 1
+            items = await self.loader(fragment)
+            # erst schreiben und übernehmen, dann Lease/_inflight freigeben – sonst lädt in der Lücke ein
+            # zweiter Request bzw. Worker dasselbe Fragment noch einmal upstream
+            e = await self._shared("set", fragment, items) if self.backend is not None else (time.time(), items)
+            self._adopt(fragment, e)
+            return items
+        except Exception as ex:
+            self.stats["errors"] += 1
+            if leased: await self._shared("fail", fragment)
+            if isinstance(ex, CircuitOpen): log.debug("Shopify Breaker offen, überspringe „%s“", fragment)
+            elif isinstance(ex, LeaseFailed): log.debug("Lease-Inhaber für „%s“ gescheitert, nicht weiter warten", fragment)
+            else: log.exception("Shopify search error: %s", ex)
+            # Fehler: lieber altes Ergebnis als gar keins (wird nicht neu gecacht → nächster Call versucht es wieder)
+            hit = self._local.get(fragment)
+            return hit[1] if hit else []
+        finally:
+            if leased: await self._shared("release", fragment)
+            self._inflight.pop(fragment, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "entries": len(self._local),
+            "inflight": len(self._inflight),
+            "hit_ratio": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 4) if lookups else None,
+            "ttl": self.ttl, "stale": self.stale, "maxsize": self.maxsize, "version": self.version,
+            "shared": self.backend.snapshot() if self.backend is not None else None,
+        }
+
+PRODUCT_CACHE = ProductCache(shopify_fetch_by_title, PRODUCT_CACHE_TTL, PRODUCT_CACHE_STALE, PRODUCT_CACHE_MAX,
+                             make_cache("products", PRODUCT_CACHE_MAX, PRODUCT_CACHE_TTL + PRODUCT_CACHE_STALE), CACHE_LEASE_S)
+
+# ---------- Katalog-Sync ----------
+# Mit CATALOG_SYNC=1 wird der komplette Storefront-Katalog seitenweise (first/after) geladen – beim Start und
+# dann alle CATALOG_SYNC_S Sekunden – und lokal nach Titel-Wort, Tag und Edition indiziert. Produktsuchen
+# („title:X OR tag:X“) werden dann ohne Upstream-Call beantwortet. Jeder geänderte Stand landet atomar in
+# CATALOG_PATH; beim Start wird zuerst dieser Snapshot geladen, damit sofort Produkte da sind – auch wenn
+# Shopify gerade nicht erreichbar ist. Solange weder Snapshot noch Sync da sind, läuft die normale Suche.
+# JSON-Parsen, Vergleich und Indizieren laufen per asyncio.to_thread, getauscht wird im Event-Loop.
+CATALOG_GQL = """
+query($first: Int!, $after: String) {
+  products(first: $first, after: $after) {
+    edges {
+      node {
+        title handle tags
+        variants(first:1){ edges{ node{ price { amount currencyCode }}}}
+        images(first:1){ edges{ node{ url } } }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+class Catalog:
+    def __init__(self, path: str, interval: float, page_size: int, max_pages: int):
+        self.path, self.interval, self.page_size, self.max_pages = path, interval, page_size, max_pages
+        self.nodes: List[Dict[str, Any]] = []
+        self.cards: List[Dict[str, Any]] = []
+        self.by_word: Dict[str, List[int]] = {}      # normalisiertes Titel-Wort → Produkt-Indizes
+        self.by_tag: Dict[str, List[int]] = {}       # normalisierter Tag → Produkt-Indizes
+        self.by_edition: Dict[str, List[int]] = {}   # Edition (CATS-Key) → Produkt-Indizes
+        self._memo: Dict[str, List[Dict[str, Any]]] = {}
+        self.ready = False
+        self.version = 0
+        self.digest = 0                              # Inhalts-Hash der Karten (ETag, in jedem Worker gleich)
+        self.synced_at: Optional[float] = None
+        self.source: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"syncs":0,"sync_errors":0,"pages":0,"searches":0}
+
+    def _index(self, nodes: List[Dict[str, Any]]) -> Tuple[Any, ...]:
+        # reine Berechnung (im Thread): Karten, Hash und Indizes für _apply
+        by_word: Dict[str, List[int]] = {}
+        by_tag: Dict[str, List[int]] = {}
+        by_edition: Dict[str, List[int]] = {}
+        editions = [(intent, norm(frag)) for intent, frag in EDITION_FRAGMENTS.items()]
+        titles = norm_many([n.get("title") or "" for n in nodes])
+        for i, n in enumerate(nodes):
+            words = set(titles[i].split())
+            tags = set(norm_many(n.get("tags") or []))
+            for w in words: by_word.setdefault(w, []).append(i)
+            for t in tags: by_tag.setdefault(t, []).append(i)
+            for intent, nf in editions:
+                if nf in words or nf in tags: by_edition.setdefault(intent, []).append(i)
+        cards = [product_card(n) for n in nodes]
+        return nodes, cards, content_digest(cards), by_word, by_tag, by_edition
+
+    def _apply(self, state: Tuple[Any, ...]) -> None:
+        # im Event-Loop, in einem Schritt: keine Suche sieht einen halb getauschten Katalog
+        self.nodes, self.cards, self.digest, self.by_word, self.by_tag, self.by_edition = state
+        self._memo = {}
+        self.ready = True
+        self.version += 1
+
+    def search(self, fragment: str, limit: int = 10) -> List[Dict[str, Any]]:
+        # wie „title:X OR tag:X“: alle Wörter von X im Titel oder X als Tag; Reihenfolge = Katalog-Reihenfolge
+        hit = self._memo.get(fragment)
+        if hit is not None: return hit
+        self.stats["searches"] += 1
+        key = norm(fragment)
+        if key in self.by_edition:
+            items = self._memo[fragment] = [self.cards[i] for i in self.by_edition[key][:limit]]
+            return items
+        words = key.split()
+        ids = set(self.by_tag.get(key, ()))
+        if words:
+            title = set(self.by_word.get(words[0], ()))
+            for w in words[1:]: title &= set(self.by_word.get(w, ()))
+            ids |= title
+        items = self._memo[fragment] = [self.cards[i] for i in sorted(ids)[:limit]]
+        return items
+
+    def _read_snapshot(self) -> Tuple[Dict[str, Any], Tuple[Any, ...]]:
+        with open(self.path, encoding="utf-8") as f:
+            snap = json.load(f)
+        return snap, self._index(snap["products"])
+
+    def _index_changed(self, nodes: List[Dict[str, Any]]) -> Optional[Tuple[Any, ...]]:
+        # None = gleicher Katalog wie bisher (Vergleich über alle Produkte, daher auch im Thread)
+        return None if self.ready and nodes == self.nodes else self._index(nodes)
+
+    async def load_snapshot(self) -> bool:
+        # Parsen und Indizieren im Thread – bei großen Katalogen sonst spürbar auf dem Event-Loop
+        try:
+            snap, state = await asyncio.to_thread(self._read_snapshot)
+        except FileNotFoundError:
+            return False
+        except Exception as ex:
+            log.warning("Katalog-Snapshot %s nicht lesbar: %s", self.path, ex)
+            return False
+        self._apply(state)
+        self.synced_at, self.source = snap.get("synced_at"), "snapshot"
+        log.info("Katalog-Snapshot geladen: %d Produkte (Stand %s)", len(self.nodes), self.synced_at)
+        return True
+
+    def _write_snapshot(self, nodes: List[Dict[str, Any]], synced_at: float) -> None:
+        # eigene Temp-Datei je Schreibvorgang: jeder Worker synct selbst, ein fester .tmp-Name könnte sich mischen
+        fd, tmp = tempfile.mkstemp(prefix=".emil-catalog-", dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"synced_at": synced_at, "api_version": SHOP_API_VERSION, "products": nodes}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp): os.unlink(tmp)
+            raise
+
+    async def _fetch_all(self) -> List[Dict[str, Any]]:
+        headers = {"Content-Type":"application/json","X-Shopify-Storefront-Access-Token": SHOP_TOKEN}
+        nodes: List[Dict[str, Any]] = []
+        after: Optional[str] = None
+        for _ in range(self.max_pages):
+            r = await get_http().post(SHOP_GRAPHQL_URL, headers=headers,
+                                      json={"query": CATALOG_GQL, "variables": {"first": self.page_size, "after": after}})
+            r.raise_for_status()
+            page = r.json()["data"]["products"]
+            self.stats["pages"] += 1
+            nodes.extend(e["node"] for e in page.get("edges") or [])
+            info = page.get("pageInfo") or {}
+            if not info.get("hasNextPage"): return nodes
+            after = info.get("endCursor")
+        raise RuntimeError(f"Katalog hat mehr als {self.max_pages} Seiten à {self.page_size}")
+
+    async def sync(self) -> bool:
+        if not SHOP_DOMAIN or not SHOP_TOKEN: return False
+        if SHOPIFY_BREAKER.state == "open":
+            log.info("Katalog-Sync übersprungen: Shopify-Breaker offen")
+            return False
+        t0 = time.perf_counter_ns()
+        try:
+            nodes = await self._fetch_all()
+        except Exception as ex:
+            self.stats["sync_errors"] += 1
+            self.last_error = f"{type(ex).__name__}: {ex}"
+            if METRICS_ENABLED: METRICS.inc("emil_catalog_syncs_total", outcome="error")
+            log.warning("Katalog-Sync fehlgeschlagen (%s) – behalte %d Produkte", self.last_error, len(self.nodes))
+            return False
+        self.stats["syncs"] += 1
+        self.last_error = None
+        self.synced_at, self.source = time.time(), "shopify"
+        if METRICS_ENABLED:
+            METRICS.inc("emil_catalog_syncs_total", outcome="ok")
+            METRICS.observe("emil_catalog_sync_seconds", (), time.perf_counter_ns() - t0)
+        state = await asyncio.to_thread(self._index_changed, nodes)
+        if state is not None: self._apply(state)
+        try:
+            await asyncio.to_thread(self._write_snapshot, nodes, self.synced_at)
+        except OSError as ex:
+            log.warning("Katalog-Snapshot nicht schreibbar (%s): %s", self.path, ex)
+        return True
+
+    async def _run(self) -> None:
+        await self.load_snapshot()
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None: return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats, "enabled": CATALOG_SYNC, "ready": self.ready, "source": self.source,
+            "products": len(self.nodes), "version": self.version, "synced_at": self.synced_at,
+            "age_s": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+            "last_error": self.last_error, "interval_s": self.interval,
+            "editions": {k: len(v) for k, v in sorted(self.by_edition.items())},
+        }
+
+CATALOG = Catalog(CATALOG_PATH, CATALOG_SYNC_S, CATALOG_PAGE_SIZE, CATALOG_MAX_PAGES)
+
+def products_fresh(fragment: str) -> bool:
+    # dürfen Antworten mit diesen Produkten gecacht werden?
+    return CATALOG.ready or PRODUCT_CACHE.is_fresh(fragment)
+
+def products_version() -> int:
+    # beide Zähler steigen nur → die Summe ändert sich genau dann, wenn sich einer ändert
+    return PRODUCT_CACHE.version + CATALOG.version
+
+async def shopify_lookup(fragment: str) -> Tuple[List[Dict[str, Any]], bool]:
+    # (Produkte, degradiert) – degradiert = Latenzbudget überschritten oder Breaker offen
+    if CATALOG.ready: return CATALOG.search(fragment), False
+    if not SHOP_DOMAIN or not SHOP_TOKEN:
+        log.warning("Shopify nicht konfiguriert.")
+        return [], False
+    # wer auf Shopify warten müsste, braucht einen Slot – sonst gleich die Antwort ohne Produkte
+    gated = not PRODUCT_CACHE.is_cached(fragment)
+    if gated and not await ADMISSION.shopify_slot():
+        return [], True
+    t0 = time.monotonic()
     try:
-        if os.path.exists("recipes.json"):
-            with open("recipes.json","r",encoding="utf-8") as f: return json.load(f)
-    except Exception as ex:
-        log.warning("recipes.json nicht lesbar: %s", ex)
-    return []
+        items = await asyncio.wait_for(PRODUCT_CACHE.get(fragment), SHOPIFY_BUDGET_MS / 1000)
+    except asyncio.TimeoutError:
+        log.warning("Shopify über Latenzbudget (%d ms) für „%s“ – Fallback", SHOPIFY_BUDGET_MS, fragment)
+        return [], True
+    finally:
+        if gated: ADMISSION.shopify_done(time.monotonic() - t0)
+    return items, not items and SHOPIFY_BREAKER.state == "open"
+
+async def shopify_search_by_title(fragment: str) -> List[Dict[str, Any]]:
+    return (await shopify_lookup(fragment))[0]
+
+def search_fallback(frag: str) -> List[Dict[str, Any]]:
+    # Link auf die Shop-Suche, wenn Shopify nichts (oder nicht rechtzeitig) liefert
+    if not SHOP_URL_BASE: return []
+    return [{"title": frag,"url": f"{SHOP_URL_BASE}/search?q={frag}","image":"","price":"","currency":"EUR"}]
+
+EDITION_FRAGMENTS = {
+    "rotkaeppchen":"Rotkäppchen","froschkoenig":"Froschkönig","aschenputtel":"Aschenputtel",
+    "sterntaler":"Sterntaler","classic":"Classic","limetta":"Limetta","mandarina":"Mandarina","rosata":"Rosata"
+}
+
+# ---------- Rezepte-Lookup ----------
+# recipes.json wird einmal geladen, gins vorab normalisiert und ein Index Edition → Rezepte gebaut.
+# Neu geladen wird nur, wenn sich die mtime ändert; der fertige Snapshot wird in einem Schritt
+# ausgetauscht, laufende Requests sehen also nie einen halb gebauten Index. Im Server läuft das Laden (JSON,
+# Prüfung, Index, Hash – bei zehntausenden Rezepten Hunderte ms) per asyncio.to_thread, bis zum Tausch im
+# Event-Loop gilt der alte Snapshot; wie bei SnapshotIndex übergeben sync-Routen an den Loop, Skripte laden direkt.
+class RecipeSnapshot:
+    __slots__ = ("mtime","extra","index","loaded_at","load_ms","error","digest")
+    def __init__(self, mtime: Optional[float], extra: List[Dict[str, Any]], index: Dict[str, Tuple[Dict[str, Any], ...]],
+                 load_ms: float, error: Optional[str]):
+        self.mtime, self.extra, self.index, self.load_ms, self.error = mtime, extra, index, load_ms, error
+        self.loaded_at = time.time()
+        self.digest = content_digest(extra)   # inhaltlich, also in jedem Worker gleich (ETag)
+
+def check_recipe(i: int, r: Any) -> None:
+    # ein kaputter Eintrag verwirft die ganze Datei (wie nicht lesbares JSON → letzter guter Stand)
+    if not isinstance(r, dict): raise ValueError(f"Eintrag {i}: erwartet ein Objekt")
+    if not isinstance(r.get("name"), str) or not r["name"]: raise ValueError(f"Eintrag {i}: name fehlt")
+    if not isinstance(r.get("instructions"), str): raise ValueError(f"Eintrag {i}: instructions fehlt")   # Pflicht in RecipeCard
+    for key in ("gins","tags","ingredients"):
+        v = r.get(key)
+        if v is not None and not (isinstance(v, list) and all(isinstance(x, str) for x in v)):
+            raise ValueError(f"Eintrag {i}: {key} muss eine Liste von Texten sein")
+
+class RecipeStore:
+    def __init__(self, path: str, builtin: List[Dict[str, Any]], check_s: float):
+        self.path, self.builtin, self.check_s = path, builtin, check_s
+        self.version = 0
+        self._checked = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._failed: Any = False        # mtime, deren Laden abbrach → nicht bei jeder Prüfung neu versuchen
+        self.snap: Optional[RecipeSnapshot] = None
+        self._swap(self._load(self._mtime(), None))
+
+    def _mtime(self) -> Optional[float]:
+        try: return os.stat(self.path).st_mtime
+        except OSError: return None
+
+    def _load(self, mtime: Optional[float], prev: Optional[RecipeSnapshot]) -> RecipeSnapshot:
+        t0 = time.perf_counter()
+        extra, error = [], None
+        if mtime is not None:
+            try:
+                with open(self.path,"r",encoding="utf-8") as f: extra = json.load(f)
+                if not isinstance(extra, list): raise ValueError("erwartet eine JSON-Liste")
+                for i, r in enumerate(extra): check_recipe(i, r)
+            except Exception as ex:
+                log.warning("%s nicht lesbar: %s", self.path, ex)
+                error = str(ex)
+                # kaputte Datei: letzten guten Stand behalten
+                extra = prev.extra if prev else []
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for r in self.builtin + extra:
+            for g in dict.fromkeys(norm_many(r.get("gins") or [])):
+                index.setdefault(g, []).append(r)
+        return RecipeSnapshot(mtime, extra, {k: tuple(v) for k, v in index.items()}, (time.perf_counter() - t0) * 1000, error)
+
+    def _swap(self, snap: RecipeSnapshot) -> None:
+        # nur im Event-Loop bzw. ohne Loop: version und snap ändern sich zusammen
+        if snap.error is None or self.snap is None: self.version += 1
+        self.snap = snap
+
+    def current(self) -> RecipeSnapshot:
+        now = time.monotonic()
+        if now - self._checked >= self.check_s:
+            self._checked = now
+            mtime = self._mtime()
+            if mtime != self.snap.mtime and mtime != self._failed: self._refresh(mtime)
+        return self.snap
+
+    def start(self) -> None:
+        # ab jetzt wird im Thread neu geladen; sync-Routen (Threadpool) übergeben an diesen Loop
+        self._loop = asyncio.get_running_loop()
+
+    def _refresh(self, mtime: Optional[float]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._refresh, mtime)
+        elif loop is None:
+            self._swap(self._load(mtime, self.snap))
+            log.info("Rezepte neu geladen: %d (%.1f ms)", len(self.builtin) + len(self.snap.extra), self.snap.load_ms)
+        elif self._task is None and mtime != self.snap.mtime:
+            self._loop = loop
+            self._task = loop.create_task(self._reload(mtime))
+
+    async def _reload(self, mtime: Optional[float]) -> None:
+        try:
+            snap = await asyncio.to_thread(self._load, mtime, self.snap)
+            self._swap(snap)
+            log.info("Rezepte neu geladen: %d (%.1f ms)", len(self.builtin) + len(snap.extra), snap.load_ms)
+        except Exception:
+            self._failed = mtime
+            log.exception("%s: Neuladen fehlgeschlagen, alter Stand bleibt", self.path)
+        finally:
+            self._task = None
+
+    def current_version(self) -> int:
+        self.current()
+        return self.version
+
+    def for_intent(self, intent: str) -> List[Dict[str, Any]]:
+        return list(self.current().index.get(intent, ()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        snap = self.current()
+        return {
+            "path": self.path,
+            "version": self.version,
+            "reloading": self._task is not None,
+            "recipes": len(self.builtin) + len(snap.extra),
+            "builtin": len(self.builtin),
+            "extra": len(snap.extra),
+            "mtime": snap.mtime,
+            "loaded_at": snap.loaded_at,
+            "load_ms": round(snap.load_ms, 3),
+            "error": snap.error,
+            "per_intent": {k: len(v) for k, v in snap.index.items()},
+        }
+
+RECIPE_STORE = RecipeStore(RECIPES_PATH, RECIPES_BUILTIN, RECIPES_CHECK_S)
 
 def find_recipes_for_intent(intent: str) -> List[Dict[str, Any]]:
-    res = [r for r in RECIPES_BUILTIN if intent in [norm(g) for g in r.get("gins",[])]]
-    for r in load_extra_recipes():
-        if intent in [norm(g) for g in r.get("gins",[])]: res.append(r)
-    return res
+    return RECIPE_STORE.for_intent(intent)
+
+# ---------- Zutaten-Index ----------
+# Invertierter Index normalisiertes Zutaten-Wort → Rezepte über RECIPES_BUILTIN, CLASSICS und recipes.json.
+# „Cocktail mit Limette und Basilikum“ sucht pro genanntem Wort per Präfix im sortierten Vokabular
+# („limette“ trifft „limettenscheibe“), zählt Treffer nur über die Posting-Listen und nimmt die besten k.
+# Gebaut wird neu, sobald RECIPE_STORE einen neuen Snapshot hat (siehe SnapshotIndex).
+INGREDIENT_STOPWORDS = {"ml","cl","dl","tl","el","g","gin","gutshof","eis","oder","und","mit","viel","etwas",
+                        "frisch","frische","frischer","optional","dash","dashes","schuss","spritzer","auffuellen"}
+
+def ingredient_terms(text: str) -> List[str]:
+    return ingredient_words(norm(text))
+
+def ingredient_words(normed: str) -> List[str]:
+    return [w for w in normed.split() if len(w) > 2 and not w.isdigit() and w not in INGREDIENT_STOPWORDS]
+
+class SnapshotIndex(ABC):
+    # Index über die Rezepte eines RecipeStore-Snapshots. Der erste Bau läuft direkt (oder vorab per warm()),
+    # jeder spätere Neubau – recipes.json kann zehntausende Rezepte haben – im Thread: bis zum Tausch bedient der
+    # alte Stand (stale=True, solche Antworten werden nicht gecacht). Ohne Event-Loop (Skripte) direkt; aus dem
+    # Threadpool (sync-Routen) wird die Prüfung an den Loop des Servers übergeben, gebaut wird nie nebenher.
+    # Schlägt ein Bau fehl, bleibt der letzte gute (anfangs leere) Stand, neu versucht wird im Hintergrund
+    # frühestens nach retry_s – nie wieder direkt im Request.
+    retry_s = 30.0
+
+    def __init__(self, store: Optional[RecipeStore]):
+        self.store = store
+        self._snap: Any = False          # Snapshot des bedienten Stands (False = noch nie gebaut)
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._failed: Optional[Tuple[Any, float]] = None    # (Snapshot, monotonic) des letzten Fehlschlags
+        self.stale = False
+        self.build_ms = 0.0
+        self.rebuilds = 0
+
+    @abstractmethod
+    def _compute(self, snap: Optional[RecipeSnapshot]) -> Any:
+        # reine Berechnung (läuft ggf. im Thread), Ergebnis für _apply
+        ...
+
+    @abstractmethod
+    def _apply(self, state: Any) -> None:
+        # neuen Stand in einem Schritt übernehmen (im Event-Loop bzw. ohne Loop)
+        ...
+
+    def _build(self, snap: Optional[RecipeSnapshot]) -> None:
+        t0 = time.perf_counter()
+        self._apply(self._compute(snap))
+        self._snap, self.stale, self._failed = snap, False, None
+        self.build_ms = (time.perf_counter() - t0) * 1000
+
+    def current(self) -> "SnapshotIndex":
+        snap = self.store.current() if self.store is not None else None
+        if snap is self._snap:
+            self.stale = False
+            return self
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None and self._loop is not None and not self._loop.is_closed():
+            self.stale = True
+            self._loop.call_soon_threadsafe(self.current)
+            return self
+        if loop is None:
+            self._build(snap)
+            return self
+        self._loop = loop
+        if self._snap is False and self._task is None and self._failed is None:
+            try:
+                self._build(snap)
+                return self
+            except Exception:
+                self._failed = (snap, time.monotonic())
+                log.exception("%s: Bau fehlgeschlagen, Index bleibt leer", type(self).__name__)
+        self.stale = True
+        if self._task is None and self._may_retry(snap): self._task = loop.create_task(self._rebuild(snap))
+        return self
+
+    def _may_retry(self, snap: Optional[RecipeSnapshot]) -> bool:
+        return self._failed is None or self._failed[0] is not snap or time.monotonic() - self._failed[1] >= self.retry_s
+
+    def warm(self) -> None:
+        # beim Start: ersten Bau im Hintergrund beginnen (bis dahin leer und stale)
+        self._loop = asyncio.get_running_loop()
+        if self._snap is False and self._task is None:
+            self._task = self._loop.create_task(self._rebuild(self.store.current() if self.store else None))
+
+    async def _rebuild(self, snap: Optional[RecipeSnapshot]) -> None:
+        t0 = time.perf_counter()
+        try:
+            state = await asyncio.to_thread(self._compute, snap)
+            # Tausch im Event-Loop: kein Request sieht einen halb gesetzten Stand
+            self._apply(state)
+            self._snap, self._failed = snap, None
+            self.build_ms = (time.perf_counter() - t0) * 1000
+            self.rebuilds += 1
+            log.info("%s neu gebaut (%.0f ms)", type(self).__name__, self.build_ms)
+        except Exception:
+            self._failed = (snap, time.monotonic())
+            log.exception("%s: Neubau fehlgeschlagen, alter Stand bleibt", type(self).__name__)
+        finally:
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        self.current()
+        return {"build_ms": round(self.build_ms, 3), "rebuilds": self.rebuilds, "stale": self.stale,
+                "rebuilding": self._task is not None}
+
+class IngredientIndex(SnapshotIndex):
+    def __init__(self, store: RecipeStore, fixed: List[Dict[str, Any]]):
+        super().__init__(store)
+        self.fixed = fixed
+        self.recipes: List[Dict[str, Any]] = []
+        self.sizes: List[int] = []                      # Anzahl verschiedener Zutaten-Wörter je Rezept
+        self.gins: List[FrozenSet[str]] = []            # normalisierte Editionen je Rezept
+        self.postings: Dict[str, List[int]] = {}
+        self.vocab: List[str] = []                      # sortiert → Präfixsuche per bisect
+
+    def _compute(self, snap: RecipeSnapshot) -> Any:
+        recipes, sizes, gins, postings = [], [], [], {}
+        for r in self.fixed + snap.extra:
+            if not isinstance(r, dict) or not r.get("name") or not isinstance(r.get("ingredients"), list): continue
+            terms = {t for ing in norm_many(map(str, r["ingredients"])) for t in ingredient_words(ing)}
+            i = len(recipes)
+            recipes.append(r)
+            sizes.append(len(terms))
+            gins.append(frozenset(norm_many(map(str, r.get("gins") or []))))
+            for t in terms: postings.setdefault(t, []).append(i)
+        return recipes, sizes, gins, postings, sorted(postings)
+
+    def _apply(self, state: Any) -> None:
+        self.recipes, self.sizes, self.gins, self.postings, self.vocab = state
+
+    def _expand(self, term: str) -> List[str]:
+        # Präfix, Plural/Fugen-n abgeschnitten: „erdbeeren“ → „erdbeere…“, „orangen“ → „orange…“
+        stem = term[:-1] if len(term) > 4 and term.endswith("n") else term
+        vocab = self.vocab
+        i = bisect.bisect_left(vocab, stem)
+        out = []
+        while i < len(vocab) and vocab[i].startswith(stem):
+            out.append(vocab[i])
+            i += 1
+        return out
+
+    def search(self, asked: List[str], prefer: Optional[str] = None, k: int = 3) -> List[Dict[str, Any]]:
+        # Rang: meiste getroffene Wunsch-Zutaten, dann passende Edition, dann wenigste fremde Zutaten
+        self.current()
+        wanted = list(dict.fromkeys(t for a in asked for t in ingredient_terms(a)))
+        hits: Dict[int, int] = {}
+        get = hits.get
+        for term in wanted:
+            vs = self._expand(term)
+            # Posting-Listen sind pro Wort eindeutig; erst bei mehreren Präfix-Treffern deduplizieren
+            ids = self.postings[vs[0]] if len(vs) == 1 else set().union(*(self.postings[v] for v in vs))
+            for i in ids: hits[i] = get(i, 0) + 1
+        if not hits: return []
+        recipes, sizes, gins = self.recipes, self.sizes, self.gins
+        def rank(i: int) -> Tuple[int, bool, int, int]:
+            h = hits[i]
+            return (h, prefer in gins[i], h - sizes[i], -i)
+        return [recipes[i] for i in heapq.nlargest(k, hits, key=rank)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "recipes": len(self.recipes), "terms": len(self.vocab)}
+
+INGREDIENT_INDEX = IngredientIndex(RECIPE_STORE, RECIPES_BUILTIN + CLASSICS)
+
+def find_recipes_by_ingredients(asked: List[str], intent: Optional[str], k: int = 3) -> List[Dict[str, Any]]:
+    return INGREDIENT_INDEX.search(asked, intent if intent in CATS else None, k)
 
 # ---------- Klassiker & Editions-Vorschläge ----------
-def classic_suggestions(prefer: Optional[str]) -> List[Dict[str, Any]]:
-    # priorisiere passend zur Edition, sonst mischen
-    arr = []
-    if prefer:
-        for c in CLASSICS:
-            if prefer in [norm(g) for g in c["gins"]]: arr.append(c)
-    # auffüllen mit allgemeinen
-    for c in CLASSICS:
-        if c not in arr: arr.append(c)
-    return arr[:4]
+def classic_suggestions(prefer: Optional[str]) -> Tuple[Dict[str, Any], ...]:
+    # Klassiker der Edition zuerst, aufgefüllt nach Geschmacksnähe zur Edition (einmal beim Start gerechnet,
+    # siehe CLASSIC_SUGGESTIONS unter Geschmacksprofile)
+    return CLASSIC_SUGGESTIONS.get(prefer) or tuple(CLASSICS[:4])
 
 # ---------- Cocktail-Generator ----------
 # Erzeugt ein sinnvolles Rezept aus frei genannten Zutaten
@@ -233,6 +1610,13 @@ BITTER = ["angostura","campari","aperol","amaro","orange bitters","peychaud","bi
 HERBS  = ["basilikum","minze","rosmarin","thymian","salbei","gurke"]
 BUBBLY = ["soda","tomic","tonic","sekt","champagner","prosecco","sodawasser","soda wasser","soda water","soda-water","soda water"]
 FRUITY = ["erdbeere","himbeere","brombeere","maracuja","pfirsich","aprikose","ananas","mandarine"]
+FLAVOR_TERMS = [(t, cls) for cls, terms in (("citrus",CITRUS),("sweet",SWEET),("bitter",BITTER),("herbs",HERBS),
+                                            ("bubbly",BUBBLY),("fruity",FRUITY)) for t in terms]
+
+@lru_cache(maxsize=4096)
+def ingredient_flavors(ingredient: str) -> FrozenSet[str]:
+    # Geschmacksklassen einer genannten Zutat (Teilstring-Treffer wie bisher), einmal pro Zutat berechnet
+    return frozenset(cls for t, cls in FLAVOR_TERMS if t in ingredient)
 
 def parse_ingredients_freeform(q: str) -> List[str]:
     # alles nach "mit ..." / "mit:" / "aus ..." / "zutaten ..." splitten
@@ -267,15 +1651,17 @@ def pick_base(intent: Optional[str]) -> str:
         None:"Gutshof Gin Classic"
     }[intent if intent in CATS else None]
 
-def generate_cocktail(asked: List[str], intent: Optional[str]) -> Dict[str, Any]:
+def generate_cocktail(asked: List[str], intent: Optional[str], seed: Optional[int] = None) -> Dict[str, Any]:
+    # seed gesetzt → gleicher Name für gleiche Anfrage (cachebar), sonst zufällig
     base = pick_base(intent)
     # heuristik: baue einen balancierten Sour/Collins/Highball je nach Zutaten
-    has_citrus = any(any(c in a for c in CITRUS) for a in asked)
-    has_bubbly = any(any(b in a for b in BUBBLY) for a in asked)
-    has_sweet  = any(any(s in a for s in SWEET) for a in asked)
-    has_herbs  = any(any(h in a for h in HERBS) for a in asked)
-    has_bitter = any(any(b in a for b in BITTER) for a in asked)
-    has_fruit  = any(any(f in a for f in FRUITY) for a in asked)
+    flavors = frozenset().union(*map(ingredient_flavors, asked))
+    has_citrus = "citrus" in flavors
+    has_bubbly = "bubbly" in flavors
+    has_sweet  = "sweet" in flavors
+    has_herbs  = "herbs" in flavors
+    has_bitter = "bitter" in flavors
+    has_fruit  = "fruity" in flavors
 
     name_pool = []
     style = ""
@@ -303,7 +1689,7 @@ def generate_cocktail(asked: List[str], intent: Optional[str]) -> Dict[str, Any]
         glass = "Highball"
         name_pool = ["Gutshof Highball","Meadow Tonic","Garden Highball"]
 
-    chosen_name = random.choice(name_pool)
+    chosen_name = (random.Random(seed) if seed is not None else random).choice(name_pool)
 
     # Mengen – baseline
     ml_gin = 50
@@ -355,21 +1741,241 @@ def generate_cocktail(asked: List[str], intent: Optional[str]) -> Dict[str, Any]
 
 def wants_custom_cocktail(nq: str) -> bool:
     # Auslöser: "mach mir ... mit", "cocktail mit", "drink mit", "rezept mit", "aus ..."
-    triggers = ["cocktail mit","drink mit","rezept mit","mach mir","mach einen","aus ","zutaten","mit "]
-    return any(t in nq for t in triggers) and (" mit " in nq or " aus " in nq or " zutaten" in nq)
+    return ROUTER.test("custom_trigger", nq) and ROUTER.test("custom_marker", nq)
+
+# ---------- Geschmacksprofile ----------
+# Jede Edition, jedes Rezept und jeder Klassiker bekommt einen Geschmacksvektor über die Klassen des
+# Cocktail-Generators (CITRUS … FRUITY): Treffer in den Zutaten, Tags und die Profile der genannten Editionen,
+# auf Länge 1 normiert. Alle Rezepte liegen als float32-Matrix vor; Vorschläge sind ein einziges
+# Matrix-Vektor-Produkt (Kosinus-Ähnlichkeit) plus Bonus für die gewünschte Edition, daraus die besten k.
+FLAVOR_AXES = ("citrus","sweet","bitter","herbs","bubbly","fruity")
+_AXIS = {a: i for i, a in enumerate(FLAVOR_AXES)}
+TAG_FLAVORS = {"frisch":"citrus","zitrus":"citrus","fruchtig":"fruity","kraeuterig":"herbs","kraeuter":"herbs",
+               "spritz":"bubbly","bitter":"bitter","suess":"sweet"}
+TAG_WEIGHT, GIN_WEIGHT = 0.5, 0.5      # Anteil von Tags bzw. Editions-Profil am Rezeptvektor
+PREFER_BONUS = 1.0                     # > jede Kosinus-Differenz → Rezepte der Edition immer zuerst
+EDITION_FLAVORS = {
+    "classic":      {"citrus":1, "herbs":.5, "bitter":.3},
+    "rotkaeppchen": {"fruity":1, "sweet":.5},
+    "froschkoenig": {"herbs":1, "citrus":.5},
+    "aschenputtel": {"sweet":1, "fruity":.5},
+    "sterntaler":   {"citrus":.7, "bubbly":.7, "sweet":.3},
+    "limetta":      {"citrus":1, "bubbly":.3},
+    "mandarina":    {"citrus":.7, "bitter":.7, "sweet":.3},
+    "rosata":       {"fruity":1, "sweet":.5},
+}
+
+def unit_rows(m: np.ndarray) -> np.ndarray:
+    # Zeilen auf Länge 1, Nullzeilen bleiben 0
+    n = np.linalg.norm(m, axis=-1, keepdims=True)
+    return np.divide(m, n, out=np.zeros_like(m), where=n > 0)
+
+EDITION_ROW = {c: i for i, c in enumerate(CATS)}
+
+@lru_cache(maxsize=1)
+def edition_vectors() -> np.ndarray:
+    # Editionen × Achsen, erst beim ersten Gebrauch (numpy wird dann importiert)
+    return unit_rows(np.array([[EDITION_FLAVORS[c].get(a, 0) for a in FLAVOR_AXES] for c in CATS], dtype=np.float32))
+
+def flavor_counts(ingredients: Iterable[str], tags: Iterable[str] = (), memo: Optional[Dict[str, FrozenSet[str]]] = None) -> List[float]:
+    # Rohwerte je Achse; memo = Zutat → Klassen für einen ganzen Index-Bau (am lru_cache vorbei)
+    v = [0.0] * len(FLAVOR_AXES)
+    for ing in norm_many(ingredients):
+        if memo is None: fl = ingredient_flavors(ing)
+        else:
+            fl = memo.get(ing)
+            if fl is None: fl = memo[ing] = ingredient_flavors.__wrapped__(ing)
+        for cls in fl: v[_AXIS[cls]] += 1
+    for tag in norm_many(tags):
+        cls = TAG_FLAVORS.get(tag)
+        if cls: v[_AXIS[cls]] += TAG_WEIGHT
+    return v
+
+def flavor_vector(ingredients: Iterable[str], tags: Iterable[str] = (), gins: Iterable[str] = ()) -> np.ndarray:
+    v = np.array(flavor_counts(ingredients, tags), dtype=np.float32)
+    for g in norm_many(gins):
+        if g in EDITION_ROW: v += GIN_WEIGHT * edition_vectors()[EDITION_ROW[g]]
+    return unit_rows(v)
+
+def nearest_edition(vec: np.ndarray) -> str:
+    # Edition mit dem ähnlichsten Profil (Nullvektor → classic)
+    if not vec.any(): return "classic"
+    return CATS[int(np.argmax(edition_vectors() @ vec))]
+
+class FlavorIndex(SnapshotIndex):
+    # Geschmacksmatrix über fixe Rezepte (+ recipes.json, falls store gesetzt); neu gebaut wie IngredientIndex
+    def __init__(self, store: Optional[RecipeStore], fixed: List[Dict[str, Any]]):
+        super().__init__(store)
+        self.fixed = fixed
+        self.recipes: List[Dict[str, Any]] = []
+        self.matrix: Optional[np.ndarray] = None        # Rezept × Achse, ab dem ersten Bau
+        self.gin_mask: Optional[np.ndarray] = None      # Rezept × Edition
+
+    def _compute(self, snap: Optional[RecipeSnapshot]) -> Any:
+        recipes, rows, mask, memo = [], [], [], {}
+        for r in self.fixed + (snap.extra if snap else []):
+            if not isinstance(r, dict) or not r.get("name") or not isinstance(r.get("ingredients"), list): continue
+            recipes.append(r)
+            rows.append(flavor_counts(map(str, r["ingredients"]), map(str, r.get("tags") or []), memo))
+            gins = set(norm_many(map(str, r.get("gins") or [])))
+            mask.append([c in gins for c in CATS])
+        n = len(recipes)
+        counts = np.array(rows, dtype=np.float32).reshape(n, len(FLAVOR_AXES))
+        gin_mask = np.array(mask, dtype=bool).reshape(n, len(CATS))
+        # Editions-Profile aller genannten Gins in einem Schritt dazu
+        return recipes, unit_rows(counts + GIN_WEIGHT * (gin_mask.astype(np.float32) @ edition_vectors())), gin_mask
+
+    def _apply(self, state: Any) -> None:
+        self.recipes, self.matrix, self.gin_mask = state
+
+    def scores(self, vec: np.ndarray, prefer: Optional[str] = None) -> np.ndarray:
+        s = self.matrix @ vec
+        col = EDITION_ROW.get(prefer)
+        if col is not None: s = s + PREFER_BONUS * self.gin_mask[:, col]
+        return s
+
+    def top_k(self, vec: np.ndarray, k: int, prefer: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Rang: Ähnlichkeit (+ Editions-Bonus), bei Gleichstand Reihenfolge der Definition
+        self.current()
+        n = len(self.recipes)
+        if n == 0 or k <= 0: return []
+        s = self.scores(vec, prefer)
+        if k < n:
+            kth = np.partition(s, n - k)[n - k]        # k-größter Wert, O(n)
+            idx = np.flatnonzero(s >= kth)             # mit allen Gleichständen an der Grenze
+        else:
+            idx = np.arange(n)
+        idx = idx[np.lexsort((idx, -s[idx]))][:k]
+        return [self.recipes[i] for i in idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "recipes": len(self.recipes), "axes": list(FLAVOR_AXES)}
+
+FLAVOR_INDEX = FlavorIndex(RECIPE_STORE, RECIPES_BUILTIN + CLASSICS)
+
+def rank_classics() -> Dict[str, List[int]]:
+    # Edition → Positionen in CLASSICS (4 Vorschläge); Zahlen statt Dicts, damit es in den Start-Snapshot passt.
+    # Dieselbe Rechnung wie FlavorIndex.top_k, aber in reinem Python über die paar Klassiker: läuft beim Import,
+    # und numpy soll erst mit dem ersten Geschmacks-Vorschlag geladen werden.
+    def unit(v: List[float]) -> List[float]:
+        n = math.sqrt(sum(x * x for x in v))
+        return [x / n for x in v] if n > 0 else v
+    eds = {c: unit([float(EDITION_FLAVORS[c].get(a, 0)) for a in FLAVOR_AXES]) for c in CATS}
+    rows = []
+    for i, r in enumerate(CLASSICS):
+        if not r.get("name") or not isinstance(r.get("ingredients"), list): continue
+        gins = set(norm_many(map(str, r.get("gins") or [])))
+        v = flavor_counts(map(str, r["ingredients"]), map(str, r.get("tags") or []))
+        for c in CATS:
+            if c in gins: v = [x + GIN_WEIGHT * e for x, e in zip(v, eds[c])]
+        rows.append((i, unit(v), gins))
+    def score(row: Tuple[int, List[float], set], c: str) -> float:
+        return sum(x * e for x, e in zip(row[1], eds[c])) + (PREFER_BONUS if c in row[2] else 0.0)
+    return {c: [row[0] for row in sorted(rows, key=lambda row: (-score(row, c), row[0]))[:4]] for c in CATS}
+
+CLASSIC_SUGGESTIONS = {c: tuple(CLASSICS[i] for i in ids) for c, ids in STARTUP.get("classic_suggestions", rank_classics).items()}
+
+def similar_recipes(asked: List[str], intent: Optional[str], k: int = 3) -> List[Dict[str, Any]]:
+    # Rezepte mit ähnlichem Geschmack, wenn keines die genannten Zutaten enthält
+    vec = flavor_vector(asked)
+    if not vec.any(): return []
+    return FLAVOR_INDEX.top_k(vec, k, intent if intent in CATS else None)
 
 # ---------- FAQ ----------
+# (FAQS-Schlüssel, Stichworte) – erster Treffer gewinnt
+FAQ_RULES = [
+    ("versand",    ["versand","liefer"]),
+    ("alkohol",    ["alkohol","prozent","abv"]),
+    ("botanicals", ["botanical","zutaten","aroma"]),
+    ("geschenk",   ["geschenk","present","gift"]),
+]
+
 def faq_answer(q: str) -> Optional[str]:
-    nq = norm(q)
-    if "versand" in nq or "liefer" in nq: return FAQS["versand"]
-    if "alkohol" in nq or "prozent" in nq or "abv" in nq: return FAQS["alkohol"]
-    if "botanical" in nq or "zutaten" in nq or "aroma" in nq: return FAQS["botanicals"]
-    if "geschenk" in nq or "present" in nq or "gift" in nq: return FAQS["geschenk"]
-    return None
+    key = ROUTER.test("faq", norm(q))
+    return FAQS[key] if key else None
+
+# ---------- Routing ----------
+# Die komplette Entscheidungskaskade von /chat als Daten. Merkmale sind Stichwort-Listen (Teilstring-Treffer
+# wie „k in nq“), beim Start je zu einer Regex kompiliert. Regeln stehen in exakt der Priorität der
+# früheren if-Kette; ein Merkmal wird erst berechnet, wenn eine Regel es braucht, und pro Nachricht nur einmal.
+ROUTE_FEATURES: Dict[str, List[str]] = {
+    "gin_keyword":    norm_many(GIN_KEYWORDS),
+    "smalltalk":      ["hallo","hi","servus","hey","moin"],
+    "custom_trigger": ["cocktail mit","drink mit","rezept mit","mach mir","mach einen","aus ","zutaten","mit "],
+    "custom_marker":  [" mit "," aus "," zutaten"],
+    "suggestions":    ["vorschlae","vorschlag","ideen","rezepte","cocktail ideen","cocktailideen","drinks"],
+    "wants_recipe":   ["rezept","cocktail","drink","mixen"],
+    "wants_pairing":  ["pair","food","essen","passt zu","pairing"],
+    "product":        ["gin","edition","produkt","produkte","zeigen","zeige","shop"],
+    # Folgefragen (Vorschlags-Chips) – greifen nur mit Session und ohne eigene Edition in der Nachricht
+    "follow_variant": ["variante","noch eine","noch einen","nochmal","andere idee"],
+    "follow_products":["passende produkte","passenden gin","produkte dazu","dazu passend","welcher gin","kaufen"],
+}
+ROUTE_FEATURES["follow_up"] = ROUTE_FEATURES["follow_variant"] + ROUTE_FEATURES["follow_products"] + ROUTE_FEATURES["wants_pairing"]
+
+# (Route, Bedingungen) – Bedingung = (Merkmal, erwarteter Wahrheitswert); die erste erfüllte Regel gewinnt
+ROUTE_RULES: List[Tuple[str, List[Tuple[str, bool]]]] = [
+    ("offtopic",        [("on_topic", False)]),
+    ("smalltalk",       [("smalltalk", True)]),
+    ("faq",             [("faq", True)]),
+    ("custom_cocktail", [("custom_trigger", True), ("custom_marker", True)]),
+    ("suggestions",     [("suggestions", True)]),
+    ("gin_generic",     [("intent", False), ("product", True)]),
+    ("no_intent",       [("intent", False)]),
+    ("edition",         []),
+]
+
+class RouteMatch:
+    __slots__ = ("nq","route","rule","features","_router")
+    def __init__(self, nq: str, router: "MessageRouter"):
+        self.nq, self._router = nq, router
+        self.route, self.rule = "", -1
+        self.features: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        f = self.features
+        if name not in f: f[name] = self._router.feature(name, self)
+        return f[name]
+
+class MessageRouter:
+    def __init__(self, features: Dict[str, List[str]], faq_rules: List[Tuple[str, List[str]]],
+                 off_topic: List[str], rules: List[Tuple[str, List[Tuple[str, bool]]]], matcher: IntentMatcher):
+        self._rx = {name: self._compile(kws) for name, kws in features.items()}
+        self._faq = [(key, self._compile(kws)) for key, kws in faq_rules]
+        self._off = re.compile("|".join(f"(?:{p})" for p in off_topic))
+        self.rules, self.matcher = rules, matcher
+        self.names = list(features) + ["on_topic","faq","intent"]
+
+    @staticmethod
+    def _compile(kws: List[str]) -> re.Pattern:
+        return re.compile("|".join(re.escape(k) for k in dict.fromkeys(kws)))
+
+    def feature(self, name: str, m: RouteMatch) -> Any:
+        nq = m.nq
+        if name == "on_topic": return m["gin_keyword"] or not self._off.search(nq)
+        if name == "faq": return next((key for key, rx in self._faq if rx.search(nq)), None)
+        if name == "intent": return self.matcher.match(nq)
+        return self._rx[name].search(nq) is not None
+
+    def test(self, name: str, nq: str) -> Any:
+        return RouteMatch(nq, self)[name]
+
+    def classify(self, nq: str, explain: bool = False) -> RouteMatch:
+        m = RouteMatch(nq, self)
+        for i, (route, conds) in enumerate(self.rules):
+            if all(bool(m[f]) == want for f, want in conds):
+                m.route, m.rule = route, i
+                break
+        if explain:
+            for name in self.names: m[name]
+        return m
+
+ROUTER = MessageRouter(ROUTE_FEATURES, FAQ_RULES, OFF_TOPIC_PATTERNS, ROUTE_RULES, INTENT_MATCHER)
 
 # ---------- Schemas ----------
 class ChatIn(BaseModel):
     message: str = Field(..., description="User-Eingabe")
+    session_id: Optional[str] = Field(None, max_length=64, description="optional: gleiche ID für Folgefragen eines Gesprächs")
 
 class ProductCard(BaseModel):
     title: str
@@ -391,10 +1997,421 @@ class ChatOut(BaseModel):
     recipes: Optional[List[RecipeCard]] = None
     pairings: Optional[List[str]] = None
     suggestions: Optional[List[str]] = None
+    _body: Optional[bytes] = PrivateAttr(default=None)   # fertig kodiertes JSON, siehe chat_body (Antworten sind nach dem Bau unveränderlich)
+
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False) -> "ChatOut":
+        # pydantic kopiert private Attribute mit – mit geänderten Feldern passen die kodierten Bytes nicht mehr
+        out = super().model_copy(update=update, deep=deep)
+        if update: out.__pydantic_private__["_body"] = None
+        return out
+
+class ChatBatchIn(BaseModel):
+    messages: List[str] = Field(..., description="User-Eingaben", max_length=BATCH_MAX)
+
+class ChatBatchOut(BaseModel):
+    results: List[Optional[ChatOut]] = Field(..., description="Antworten in Eingabe-Reihenfolge, null bei Fehler")
+    errors: Dict[int, str] = Field(default_factory=dict, description="Index → Fehlermeldung")
+
+# ---------- Statische Antworten ----------
+# Guard, Smalltalk, FAQs, Hilfetexte und die Klassiker-Vorschläge sind immer gleich: die Modelle werden
+# einmal beim Start gebaut und ihr JSON einmal kodiert. chat_body() merkt sich die Bytes am Objekt, das gilt
+# genauso für Antworten aus dem Antwort-Cache; alles andere kodiert pydantic-core direkt zu JSON
+# (gleiche Bytes wie json.dumps über model_dump, ohne den Umweg über Python-Dicts).
+def chat_body(out: ChatOut) -> bytes:
+    # direkt über __pydantic_private__: der Umweg über __getattr__ kostet ein Vielfaches
+    priv = out.__pydantic_private__
+    body = priv["_body"]
+    if body is None: body = priv["_body"] = out.model_dump_json().encode("utf-8")
+    return body
+
+def json_response(body: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+# Rezeptkarten für die festen Rezepte (Builtin + Klassiker) – Schlüssel ist die id des Modul-Dicts
+RECIPE_CARDS: Dict[int, RecipeCard] = {id(r): RecipeCard(**r) for r in RECIPES_BUILTIN}
+RECIPE_CARDS.update({id(c): RecipeCard(name=c["name"], tags=["klassiker"], ingredients=c["ingredients"],
+                                       instructions=c["instructions"], gins=c["gins"]) for c in CLASSICS})
+
+def recipe_card(r: Dict[str, Any]) -> RecipeCard:
+    card = RECIPE_CARDS.get(id(r))
+    return card if card is not None else RecipeCard(**r)
+
+STATIC_OFFTOPIC = ChatOut(
+    response="Ich helfe ausschließlich zu Gutshof Gin: Produkte, Rezepte, Cocktail-Ideen, Foodpairing, Geschenkideen & FAQs.",
+    suggestions=SUGGESTIONS_DEFAULT
+)
+STATIC_SMALLTALK = ChatOut(
+    response="Servus! Lust auf eine Empfehlung, ein Rezept, Foodpairing oder Geschenkidee?",
+    suggestions=SUGGESTIONS_DEFAULT
+)
+STATIC_FAQ = {key: ChatOut(response=text, suggestions=SUGGESTIONS_DEFAULT) for key, text in FAQS.items()}
+STATIC_CUSTOM_HELP = ChatOut(
+    response="Sag mir Zutaten, z. B.: „Mach mir einen Cocktail mit Limette, Basilikum und Soda.“",
+    suggestions=["Cocktail mit Limette & Basilikum","Drink mit Orange & Campari","Fruchtig: Erdbeere & Soda"]
+)
+STATIC_NO_INTENT = ChatOut(
+    response="Sag mir eine Edition (Rotkäppchen, Froschkönig, Aschenputtel, Sterntaler, Classic, Limetta, Mandarina, Rosata) oder nenn Zutaten für einen Cocktail.",
+    suggestions=["Zeig Classic","Cocktail mit Zitrone & Soda","Foodpairing Rotkäppchen"]
+)
+# Vorschläge je erkannter Edition (None = keine)
+STATIC_SUGGESTIONS = {prefer: ChatOut(
+    response="Hier sind Cocktail-Ideen, die mit unseren Gins super funktionieren:",
+    recipes=[recipe_card(r) for r in classic_suggestions(prefer)],
+    suggestions=["Mach mir was mit Limette","Foodpairing-Tipp","Zeig Rotkäppchen"]
+) for prefer in [None] + CATS}
+
+for _out in [STATIC_OFFTOPIC, STATIC_SMALLTALK, STATIC_CUSTOM_HELP, STATIC_NO_INTENT, *STATIC_FAQ.values(), *STATIC_SUGGESTIONS.values()]:
+    chat_body(_out)
+
+# alle Snapshot-Teile stehen → neu gerechnete (erster Start, veralteter Snapshot) für die nächste Instanz sichern
+STARTUP.save()
+
+# ---------- Antwort-Cache ----------
+# Der Großteil des Traffics sind dieselben paar Sätze (Vorschlags-Chips). Fertige Antworten werden pro
+# normalisierter Nachricht gehalten (LRU). Einträge mit Produkten hängen an der Produkt-Version (Cache bzw.
+# Katalog) und gelten nur, solange das Fragment frisch ist; Edition-Antworten zusätzlich an der Rezept-Version.
+class ResponseCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # nq → (Antwort, Fragment, Produkt-Version, Rezept-Version, (Route, Intent) fürs Query-Log)
+        self._data: "OrderedDict[str, Tuple[ChatOut, Optional[str], Optional[int], Optional[int], Tuple[str, Optional[str]]]]" = OrderedDict()
+        self.stats = {"hits":0,"misses":0,"invalidated":0,"evictions":0}
+
+    def peek(self, nq: str) -> Optional[ChatOut]:
+        # gültiger Eintrag ohne Statistik/LRU-Update; veraltete Einträge fliegen sofort raus
+        e = self._data.get(nq)
+        if e is None: return None
+        out, frag, pv, rv, _ = e
+        if ((frag is not None and (pv != products_version() or not products_fresh(frag)))
+                or (rv is not None and rv != RECIPE_STORE.current_version())):
+            del self._data[nq]
+            self.stats["invalidated"] += 1
+            return None
+        return out
+
+    def get(self, nq: str) -> Optional[ChatOut]:
+        out = self.peek(nq)
+        if out is None:
+            self.stats["misses"] += 1
+            return None
+        self._data.move_to_end(nq)
+        self.stats["hits"] += 1
+        return out
+
+    def tag(self, nq: str) -> Tuple[str, Optional[str]]:
+        e = self._data.get(nq)
+        return e[4] if e is not None else ("cached", None)
+
+    def put(self, nq: str, out: ChatOut, frag: Optional[str], recipes: bool,
+            tag: Tuple[str, Optional[str]] = ("cached", None)) -> None:
+        if self.maxsize <= 0: return
+        self._data[nq] = (out, frag, products_version() if frag is not None else None,
+                          RECIPE_STORE.version if recipes else None, tag)
+        self._data.move_to_end(nq)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self._data), "maxsize": self.maxsize,
+                "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else None}
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_MAX)
+
+# ---------- Sessions ----------
+# Mit session_id merkt sich Emil pro Gespräch, was eine Folgefrage braucht: letzte Edition, geparste Zutaten,
+# die dazu gefundenen Rezepte und die aufgelösten Produkte. Rezepte und Produkte sind Referenzen auf die Listen
+# der Antwort (bzw. des Caches), keine Kopien. Begrenzt auf SESSION_MAX Gespräche (LRU) mit Leerlauf-TTL;
+# Zutaten werden gekappt, damit ein Eintrag eine feste Obergrenze hat (bench/bench_sessions.py).
+class Session:
+    __slots__ = ("intent","ingredients","name","recipes","frag","products","variant","ts")
+    def __init__(self):
+        self.intent: Optional[str] = None
+        self.ingredients: Tuple[str, ...] = ()
+        self.name: Optional[str] = None                      # zuletzt generierter Cocktail (aus dem festen Namens-Pool)
+        self.recipes: Optional[List[RecipeCard]] = None      # Rezepte zu den Zutaten (ohne den generierten)
+        self.frag: Optional[str] = None
+        self.products: Optional[List[ProductCard]] = None
+        self.variant = 0
+        self.ts = 0.0
+
+class SessionStore:
+    MAX_INGREDIENT_LEN = 40
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data: "OrderedDict[str, Session]" = OrderedDict()    # älteste Aktivität vorne
+        self.stats = {"created":0,"resumed":0,"expired":0,"evictions":0,"follow_ups":0}
+
+    def get(self, sid: Optional[str]) -> Optional[Session]:
+        # bestehende oder neue Session; None ohne ID oder wenn abgeschaltet
+        if not sid or self.maxsize <= 0: return None
+        now = time.monotonic()
+        data = self._data
+        s = data.get(sid)
+        if s is not None and now - s.ts >= self.ttl:
+            del data[sid]
+            self.stats["expired"] += 1
+            s = None
+        if s is None:
+            # vorne liegen die am längsten inaktiven: abgelaufene abräumen, dann auf maxsize kürzen
+            while data:
+                old = next(iter(data.values()))
+                if now - old.ts < self.ttl: break
+                data.popitem(last=False)
+                self.stats["expired"] += 1
+            while len(data) >= self.maxsize:
+                data.popitem(last=False)
+                self.stats["evictions"] += 1
+            s = data[sid] = Session()
+            self.stats["created"] += 1
+        else:
+            data.move_to_end(sid)
+            self.stats["resumed"] += 1
+        s.ts = now
+        return s
+
+    def update(self, s: Session, route: str, intent: Optional[str], out: ChatOut, frag: Optional[str] = None,
+               degraded: bool = False, ingredients: Optional[List[str]] = None) -> None:
+        # nach jeder Runde: was eine spätere Folgefrage braucht (Fallback-Links werden nicht gemerkt)
+        if route == "custom_cocktail" and out.recipes and ingredients:   # nicht die Hilfe ohne Zutaten
+            s.ingredients = tuple(i[:self.MAX_INGREDIENT_LEN] for i in ingredients or ())
+            s.name, s.recipes, s.variant = out.recipes[0].name, out.recipes[1:], 0
+            s.frag = s.products = None          # „passende Produkte“ gilt jetzt diesem Cocktail
+        elif frag is not None and not degraded:
+            s.frag, s.products = frag, out.products
+        if intent: s.intent = intent
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "sessions": len(self._data), "maxsize": self.maxsize, "ttl_s": self.ttl}
+
+SESSIONS = SessionStore(SESSION_MAX, SESSION_TTL_S)
+
+def is_follow_up(nq: str, s: Optional[Session]) -> bool:
+    # könnte die Nachricht eine Folgefrage sein? Dann nicht aus dem Antwort-Cache (hängt an der Session)
+    return s is not None and ROUTER.test("follow_up", nq)
+
+def follow_up(t: Turn, s: Session) -> Optional[ChatOut]:
+    # Chip ohne eigene Edition → Kontext aus der Session statt Fallback; None = normal weiter
+    m = t.m
+    if m.route not in ("no_intent","gin_generic"): return None
+    if m["follow_variant"] and s.ingredients:
+        ings = list(s.ingredients)
+        for _ in range(8):   # neuer Name, solange der Pool einen hergibt
+            s.variant += 1
+            seed = zlib.crc32(f"{'|'.join(ings)}#{s.variant}".encode()) if COCKTAIL_SEEDED else None
+            recipe = generate_cocktail(ings, s.intent, seed=seed)
+            if recipe["name"] != s.name: break
+        s.name = recipe["name"]
+        out = ChatOut(
+            response="Noch eine Variante mit deinen Zutaten 🍸",
+            recipes=[RecipeCard(**recipe)] + (s.recipes or []),
+            suggestions=["Noch eine Variante?","Zeig passende Produkte","Foodpairing"]
+        )
+    elif m["follow_products"] and (s.products or s.intent or s.ingredients):
+        if s.products:
+            out = ChatOut(response="Passend dazu aus dem Shop:", products=s.products, suggestions=SUGGESTIONS_DEFAULT)
+        else:
+            # noch nichts aufgelöst → einmal über den Produkt-Cache, Ergebnis landet in der Session
+            t.frag = s.frag or (EDITION_FRAGMENTS.get(s.intent, s.intent) if s.intent else "Gin")
+            out = ChatOut(response="Passend dazu aus dem Shop:", suggestions=SUGGESTIONS_DEFAULT)
+    elif m["wants_pairing"] and s.intent in PAIRINGS:
+        out = ChatOut(response=f"Foodpairing zu {EDITION_FRAGMENTS.get(s.intent, s.intent)}:",
+                      pairings=PAIRINGS[s.intent], suggestions=SUGGESTIONS_DEFAULT)
+    elif m["wants_pairing"] and s.ingredients:
+        # eigener Cocktail ohne Edition → Pairings der geschmacklich nächsten Edition
+        out = ChatOut(response="Foodpairing zu deinem Cocktail:",
+                      pairings=PAIRINGS[nearest_edition(flavor_vector(s.ingredients))], suggestions=SUGGESTIONS_DEFAULT)
+    else:
+        return None
+    m.route = "follow_up"
+    if t.sw: t.sw.route = "follow_up"
+    t.cacheable = False
+    SESSIONS.stats["follow_ups"] += 1
+    return out
+
+# Zustand eines Chat-Durchlaufs: was die Antwort braucht und ob sie gecacht werden darf
+class Turn:
+    __slots__ = ("q","nq","m","frag","cacheable","uses_recipes","degraded","shopify_ns","sw","session","ingredients")
+    def __init__(self, q: str, nq: str, sw: Optional[Stopwatch] = None, session: Optional[Session] = None):
+        self.q, self.nq, self.sw, self.session = q, nq, sw, session
+        self.m: Optional[RouteMatch] = None
+        self.frag: Optional[str] = None      # abzufragendes Shopify-Fragment (None = rein lokal)
+        self.cacheable = True
+        self.uses_recipes = False
+        self.degraded = False                # Produkte aus Fallback statt von Shopify
+        self.shopify_ns = 0                  # Wartezeit auf den Produkt-Lookup
+        self.ingredients: Optional[List[str]] = None   # vom Custom-Cocktail geparst (für die Session)
+
+# ---------- Admission & Lastabwurf ----------
+# Damit eine Kampagnen-Spitze oder ein langsames Shopify nicht jeden Client ausbremst, gibt es drei Stufen:
+#  1. Rate-Limit pro Client (Token-Bucket, RATE_LIMIT_RPS/RATE_LIMIT_BURST) → 429 mit Retry-After
+#  2. Lookups, die auf Shopify warten müssten (kein frischer/stale Cache-Eintrag), brauchen einen von
+#     SHOPIFY_CONCURRENCY Slots. Wer länger als SHED_QUEUE_MS ansteht – oder gar nicht erst, weil alle Slots
+#     belegt sind und Shopify im Mittel über SHED_UPSTREAM_MS liegt –, bekommt die lokale Antwort ohne
+#     Produkte (Link auf die Shop-Suche, wie bei offenem Breaker, nicht gecacht).
+#  3. Laufen trotzdem mehr als MAX_INFLIGHT Chat-Requests gleichzeitig → 503 mit Retry-After.
+class RateLimiter:
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate, self.burst, self.maxsize = rate, burst, maxsize
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()   # Client → [Tokens, letzter Stand]
+
+    def take(self, client: str, cost: float = 1.0) -> float:
+        # 0 = erlaubt, sonst Sekunden, bis genug Tokens nachgefüllt sind
+        if self.rate <= 0: return 0.0
+        now = time.monotonic()
+        b = self._buckets.get(client)
+        if b is None:
+            if len(self._buckets) >= self.maxsize: self._buckets.popitem(last=False)
+            b = self._buckets[client] = [self.burst, now]
+        else:
+            self._buckets.move_to_end(client)
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+        cost = min(cost, self.burst)       # ein großer Batch darf den vollen Bucket aufbrauchen
+        if b[0] < cost: return (cost - b[0]) / self.rate
+        b[0] -= cost
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+def error_body(detail: str) -> bytes:
+    # gleiche Form wie FastAPIs HTTPException
+    return json.dumps({"detail": detail}, ensure_ascii=False, separators=(",",":")).encode("utf-8")
+
+RATE_LIMITED_BODY = error_body("Zu viele Anfragen – bitte kurz warten.")
+OVERLOADED_BODY = error_body("Emil ist gerade stark ausgelastet – bitte gleich nochmal versuchen.")
+
+class Admission:
+    EWMA = 0.2   # Gewicht des neuesten Messwerts für Warte- und Upstream-Zeit
+
+    def __init__(self, limiter: RateLimiter, max_inflight: int, slots: int, queue_s: float, upstream_s: float):
+        self.limiter, self.max_inflight, self.slots, self.queue_s, self.upstream_s = limiter, max_inflight, slots, queue_s, upstream_s
+        self.inflight = 0      # laufende Chat-Requests (with ADMISSION: …)
+        self.active = 0        # belegte Shopify-Slots
+        self.waiting = 0       # stehen für einen Slot an
+        self.queue_ewma = 0.0
+        self.upstream_ewma = 0.0
+        self._sem = asyncio.Semaphore(slots) if slots > 0 else None
+        self.stats = {"admitted":0,"rate_limited":0,"overloaded":0,"products_skipped":0,"queue_timeouts":0}
+
+    def client(self, request: Request) -> str:
+        if TRUST_PROXY:
+            fwd = request.headers.get("x-forwarded-for")
+            if fwd: return fwd.split(",", 1)[0].strip()
+        return request.client.host if request.client else "-"
+
+    def check(self, request: Request, cost: float = 1.0) -> Optional[Response]:
+        # None = angenommen, sonst die fertige 429/503-Antwort
+        wait = self.limiter.take(self.client(request), cost)
+        if wait:
+            return self._reject("rate_limited", RATE_LIMITED_BODY, 429, math.ceil(wait))
+        if self.inflight >= self.max_inflight:
+            return self._reject("overloaded", OVERLOADED_BODY, 503, 1)
+        self.stats["admitted"] += 1
+        return None
+
+    def _reject(self, reason: str, body: bytes, status: int, retry_after: int) -> Response:
+        self.stats[reason] += 1
+        if METRICS_ENABLED: METRICS.inc("emil_admission_rejected_total", reason=reason)
+        return json_response(body, status, {"Retry-After": str(retry_after)})
+
+    def __enter__(self) -> "Admission":
+        self.inflight += 1
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.inflight -= 1
+
+    def _skip(self, reason: str) -> bool:
+        self.stats["products_skipped"] += 1
+        if METRICS_ENABLED: METRICS.inc("emil_products_skipped_total", reason=reason)
+        return False
+
+    async def shopify_slot(self) -> bool:
+        # True = Slot belegt (danach shopify_done), False = ohne Produkte antworten
+        if self._sem is None: return True
+        if self._sem.locked() and self.upstream_ewma > self.upstream_s: return self._skip("upstream_slow")
+        t0 = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.queue_s)
+        except asyncio.TimeoutError:
+            self.stats["queue_timeouts"] += 1
+            return self._skip("queue_timeout")
+        finally:
+            self.waiting -= 1
+            self.queue_ewma += self.EWMA * (time.monotonic() - t0 - self.queue_ewma)
+        self.active += 1
+        return True
+
+    def shopify_done(self, elapsed: float) -> None:
+        if self._sem is None: return
+        self.active -= 1
+        self._sem.release()
+        self.upstream_ewma += self.EWMA * (elapsed - self.upstream_ewma)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "inflight": self.inflight, "max_inflight": self.max_inflight,
+            "shopify": {"slots": self.slots, "active": self.active, "waiting": self.waiting,
+                        "queue_wait_ms": round(self.queue_ewma * 1000, 1), "upstream_ms": round(self.upstream_ewma * 1000, 1),
+                        "shed_queue_ms": round(self.queue_s * 1000), "shed_upstream_ms": round(self.upstream_s * 1000)},
+            "rate_limit": {"rps": self.limiter.rate, "burst": self.limiter.burst, "clients": len(self.limiter),
+                           "trust_proxy": TRUST_PROXY},
+        }
+
+ADMISSION = Admission(RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST, RATE_LIMIT_CLIENTS), MAX_INFLIGHT,
+                      SHOPIFY_CONCURRENCY, SHED_QUEUE_MS / 1000, SHED_UPSTREAM_MS / 1000)
+
+# ---------- HTTP-Caching (GET /chat) ----------
+# GET /chat?q= liefert dieselbe ChatOut wie POST, aber für CDN und Browser cachebar. Der starke ETag hängt nur an
+# Dingen, die in jedem Worker gleich sind: normalisierte Nachricht, Inhalts-Hash der Produkte dieser Antwort
+# (Katalog bzw. Produkt-Cache), Inhalts-Hash von recipes.json und dem Stand von server.py. Passt If-None-Match,
+# gibt es 304, ohne die Antwort zu bauen. Antworten, die nicht deterministisch sind (Fallback wegen Budget/
+# Breaker/Lastabwurf, ungeseedete Cocktails), bekommen keinen ETag und „no-store“.
+APP_BUILD = hashlib.blake2b(SOURCE_DIGEST + SHOP_URL_BASE.encode("utf-8"), digest_size=8).digest()
+
+def route_fragment(m: RouteMatch) -> Optional[str]:
+    # welches Shopify-Fragment braucht diese Route?
+    if m.route == "gin_generic": return "Gin"
+    if m.route == "edition": return EDITION_FRAGMENTS.get(m["intent"], m["intent"])
+    return None
+
+def chat_etag(nq: str, frag: Optional[str]) -> Optional[str]:
+    # None = Produktstand unbekannt oder nicht mehr frisch → kein ETag; ein bedingter GET geht dann durch die
+    # volle Antwort, die über PRODUCT_CACHE.get auch das Erneuern anstößt (kein 304 für alte Preise)
+    if frag is None or not SHOP_DOMAIN or not SHOP_TOKEN: pd = 0
+    elif CATALOG.ready: pd = CATALOG.digest
+    else:
+        if not PRODUCT_CACHE.is_fresh(frag): return None
+        pd = PRODUCT_CACHE.digest(frag)
+        if pd is None: return None
+    h = hashlib.blake2b(f"{nq}\x00{pd}\x00{RECIPE_STORE.current().digest}".encode("utf-8"), digest_size=16, key=APP_BUILD)
+    return f'"{h.hexdigest()}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match vergleicht schwach: W/-Präfix ignorieren, mehrere Tags oder * erlaubt
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag: return True
+    return False
+
+def cache_control(frag: Optional[str]) -> str:
+    return f"public, max-age={HTTP_CACHE_PRODUCTS_S if frag is not None else HTTP_CACHE_STATIC_S}"
 
 # ---------- Routes ----------
 @app.get("/health")
-def health():
+async def health():
     return {"status":"ok","service":"Emil"}
 
 @app.get("/diag/env")
@@ -407,94 +2424,357 @@ def diag_env():
         "shop_url_base": SHOP_URL_BASE or "",
     }
 
+@app.get("/diag/cache")
+def diag_cache():
+    return {"products": PRODUCT_CACHE.snapshot(), "responses": RESPONSE_CACHE.snapshot(), "shopify_breaker": SHOPIFY_BREAKER.snapshot()}
+
+@app.get("/diag/querylog")
+def diag_querylog():
+    return QUERY_LOG.snapshot()
+
+@app.get("/diag/sessions")
+def diag_sessions():
+    return SESSIONS.snapshot()
+
+@app.get("/diag/admission")
+def diag_admission():
+    return ADMISSION.snapshot()
+
+@app.get("/diag/startup")
+def diag_startup():
+    # Snapshot-Stand und welche aufgeschobenen Importe inzwischen geladen sind
+    return {**STARTUP.snapshot(), "env_file": ENV_FILE,
+            "imports": {name: not isinstance(globals()[alias], LazyModule) for name, alias in DEFERRED_IMPORTS.items()}}
+
+@app.get("/diag/catalog")
+def diag_catalog():
+    return CATALOG.snapshot()
+
+@app.get("/diag/recipes")
+def diag_recipes():
+    return {**RECIPE_STORE.snapshot(), "ingredient_index": INGREDIENT_INDEX.snapshot(), "flavor_index": FLAVOR_INDEX.snapshot()}
+
+@app.get("/diag/route")
+def diag_route(q: str):
+    nq = norm(q)
+    m = ROUTER.classify(nq, explain=True)
+    return {"raw": q, "normalized": nq, "route": m.route, "rule": m.rule,
+            "conditions": ROUTE_RULES[m.rule][1], "features": m.features}
+
+@app.get("/diag/metrics", response_class=PlainTextResponse)
+def diag_metrics():
+    gauges: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {"emil_cache_hit_ratio": {}, "emil_cache_entries": {}}
+    for name, snap in (("products", PRODUCT_CACHE.snapshot()), ("responses", RESPONSE_CACHE.snapshot())):
+        gauges["emil_cache_hit_ratio"][(("cache", name),)] = snap["hit_ratio"] or 0
+        gauges["emil_cache_entries"][(("cache", name),)] = snap["entries"]
+    gauges["emil_shopify_breaker_open"] = {(): int(SHOPIFY_BREAKER.state != "closed")}
+    gauges["emil_recipes"] = {(): RECIPE_STORE.snapshot()["recipes"]}
+    gauges["emil_catalog_products"] = {(): len(CATALOG.nodes)}
+    ql = QUERY_LOG.snapshot()
+    counters = {"emil_query_log_records_total": {(("state", k),): ql[k] for k in ("queued","written","dropped")}}
+    gauges["emil_query_log_pending"] = {(): ql["pending"]}
+    gauges["emil_admission_inflight"] = {(): ADMISSION.inflight}
+    gauges["emil_sessions"] = {(): len(SESSIONS)}
+    gauges["emil_shopify_slots"] = {(("state", "active"),): ADMISSION.active, (("state", "waiting"),): ADMISSION.waiting}
+    return PlainTextResponse(METRICS.render(gauges, counters), media_type="text/plain; version=0.0.4")
+
 @app.get("/diag/norm")
 def diag_norm(q: str):
     return {"raw": q, "normalized": norm(q), "intent": extract_intent(q)}
 
 @app.post("/chat", response_model=ChatOut)
-def chat(body: ChatIn, request: Request):
-    q_raw = body.message or ""
+async def chat(body: ChatIn, request: Request):
+    rejected = ADMISSION.check(request)
+    if rejected is not None: return rejected
+    sw = Stopwatch() if METRICS_ENABLED else None
+    with ADMISSION:
+        out = await answer(body.message or "", sw, body.session_id)
+    # selbst serialisieren (gleiche Bytes wie response_model), damit die Stufe messbar ist
+    resp = json_response(chat_body(out))
+    if sw:
+        sw.lap("serialize")
+        METRICS.record(sw)
+    return resp
+
+@app.get("/chat", response_model=ChatOut)
+async def chat_get(request: Request, q: str = Query(..., description="User-Eingabe")):
+    rejected = ADMISSION.check(request)
+    if rejected is not None: return rejected
+    sw = Stopwatch() if METRICS_ENABLED else None
+    t0 = _now_ns()
+    nq = norm(q.strip())
+    frag = route_fragment(ROUTER.classify(nq))
+    inm = request.headers.get("if-none-match")
+    if inm:
+        etag = chat_etag(nq, frag)
+        if etag is not None and etag_matches(inm, etag):
+            if sw:
+                sw.route = "not_modified"
+                sw.lap("etag")
+                METRICS.record(sw)
+            if QUERY_LOG.enabled: log_turn(nq, t0)
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control(frag)})
+    with ADMISSION:
+        out, t = await answer_turn(q, sw)
+    etag = chat_etag(nq, frag) if t is None or (t.cacheable and not t.degraded) else None
+    headers = {"ETag": etag, "Cache-Control": cache_control(frag)} if etag is not None else {"Cache-Control": "no-store"}
+    resp = json_response(chat_body(out), headers=headers)
+    if sw:
+        sw.lap("serialize")
+        METRICS.record(sw)
+    return resp
+
+@app.post("/chat/batch", response_model=ChatBatchOut)
+async def chat_batch(body: ChatBatchIn, request: Request):
+    # jede Nachricht kostet ein Token
+    rejected = ADMISSION.check(request, len(body.messages))
+    if rejected is not None: return rejected
+    with ADMISSION:
+        # 1) lokal routen und alle benötigten Shopify-Fragmente einsammeln (dedupliziert)
+        frags = {f for f in (planned_fragment(norm(q.strip())) for q in body.messages) if f}
+        # 2) jedes Fragment genau einmal vorab laden → der Produkt-Cache ist danach warm
+        if frags:
+            await asyncio.gather(*(shopify_search_by_title(f) for f in frags), return_exceptions=True)
+        # 3) alle Nachrichten parallel beantworten; ein Fehler betrifft nur sein eigenes Item
+        outs = await asyncio.gather(*(batch_item(q) for q in body.messages), return_exceptions=True)
+    results, errors = [], {}
+    for i, out in enumerate(outs):
+        if isinstance(out, Exception):
+            log.error("Batch-Item %d fehlgeschlagen: %r", i, out)
+            results.append(None)
+            errors[i] = f"{type(out).__name__}: {out}"
+        else:
+            results.append(out)
+    # Einzelantworten sind oft schon kodiert (statisch/gecacht) → nur noch zusammensetzen
+    items = b",".join(b"null" if out is None else chat_body(out) for out in results)
+    errs = json.dumps({str(i): e for i, e in errors.items()}, ensure_ascii=False, separators=(",",":")).encode("utf-8")
+    return json_response(b'{"results":[' + items + b'],"errors":' + errs + b"}")
+
+# Streaming: lokale Inhalte (Text, Rezepte, Pairings, Vorschläge) gehen sofort raus, Produkte folgen,
+# sobald Shopify antwortet. Events in dieser Reihenfolge:
+#   content  – response, recipes, pairings, suggestions
+#   products – Produktliste (nur bei Routen mit Shopify-Abfrage)
+#   timeout  – statt products, wenn das Latenzbudget gerissen wurde/Breaker offen; data = Fallback-Links
+#   done     – Ende (error bei Ausnahme)
+# NDJSON ({"event":…,"data":…} pro Zeile), bei „Accept: text/event-stream“ als SSE.
+@app.post("/chat/stream")
+async def chat_stream(body: ChatIn, request: Request):
+    rejected = ADMISSION.check(request)
+    if rejected is not None: return rejected
+    sse = "text/event-stream" in request.headers.get("accept","")
+    return StreamingResponse(
+        stream_answer(body.message or "", sse, body.session_id),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"},
+    )
+
+def stream_event(name: str, data: Any, sse: bool) -> str:
+    if sse: return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": name, "data": data}, ensure_ascii=False) + "\n"
+
+def stream_content(out: ChatOut, sse: bool) -> str:
+    return stream_event("content", out.model_dump(include={"response","recipes","pairings","suggestions"}), sse)
+
+async def stream_answer(q_raw: str, sse: bool, session_id: Optional[str] = None):
+    sw = Stopwatch() if METRICS_ENABLED else None
+    t0 = _now_ns()
+    # erst im Generator zählen: ein Stream, der nie startet, belegt keinen Platz
+    with ADMISSION:
+        try:
+            q = q_raw.strip()
+            nq = norm(q)
+            if sw: sw.lap("norm")
+            s = SESSIONS.get(session_id)
+            hit = RESPONSE_CACHE.get(nq) if not is_follow_up(nq, s) else None
+            if sw: sw.lap("cache")
+            if hit is not None:
+                if sw: sw.route = "cached"
+                if s is not None: remember_hit(s, q, nq, hit)
+                yield stream_content(hit, sse)
+                if hit.products is not None: yield stream_event("products", hit.model_dump()["products"], sse)
+                yield stream_event("done", None, sse)
+                if sw: METRICS.record(sw)
+                if QUERY_LOG.enabled: log_turn(nq, t0)
+                return
+            t = Turn(q, nq, sw, s)
+            out = prepare_answer(t)
+            if sw: sw.lap("build")
+            if out is not None: yield stream_content(out, sse)
+            if t.frag is not None:
+                products = await fetch_products(t)
+                if sw: sw.lap("shopify")
+                final = finish_answer(t, out, products)
+                if out is None: yield stream_content(final, sse)
+                yield stream_event("timeout" if t.degraded else "products", final.model_dump()["products"], sse)
+            else:
+                final = out
+            remember(t, final)
+            yield stream_event("done", None, sse)
+            if sw: METRICS.record(sw)
+            if QUERY_LOG.enabled: log_turn(nq, t0, t)
+        except Exception as ex:
+            log.exception("Stream-Fehler: %s", ex)
+            yield stream_event("error", f"{type(ex).__name__}", sse)
+
+async def batch_item(q: str) -> ChatOut:
+    sw = Stopwatch() if METRICS_ENABLED else None
+    out = await answer(q, sw)
+    if sw: METRICS.record(sw)
+    return out
+
+def planned_fragment(nq: str) -> Optional[str]:
+    # welches Shopify-Fragment würde prepare_answer für diese Nachricht abfragen?
+    if RESPONSE_CACHE.peek(nq) is not None: return None
+    return route_fragment(ROUTER.classify(nq))
+
+async def answer(q_raw: str, sw: Optional[Stopwatch] = None, session_id: Optional[str] = None) -> ChatOut:
+    return (await answer_turn(q_raw, sw, session_id))[0]
+
+async def answer_turn(q_raw: str, sw: Optional[Stopwatch] = None,
+                      session_id: Optional[str] = None) -> Tuple[ChatOut, Optional[Turn]]:
+    # (Antwort, Turn) – Turn None = Treffer im Antwort-Cache
+    t0 = _now_ns()
     q = q_raw.strip()
     nq = norm(q)
+    if sw: sw.lap("norm")
+    s = SESSIONS.get(session_id)
+    hit = RESPONSE_CACHE.get(nq) if not is_follow_up(nq, s) else None
+    if sw: sw.lap("cache")
+    if hit is not None:
+        if sw: sw.route = "cached"
+        if s is not None: remember_hit(s, q, nq, hit)
+        if QUERY_LOG.enabled: log_turn(nq, t0)
+        return hit, None
+    t = Turn(q, nq, sw, s)
+    out = prepare_answer(t)
+    if sw: sw.lap("build")
+    if t.frag is not None:
+        products = await fetch_products(t)
+        if sw: sw.lap("shopify")
+        out = finish_answer(t, out, products)
+    remember(t, out)
+    if QUERY_LOG.enabled: log_turn(nq, t0, t)
+    return out, t
+
+def remember(t: Turn, out: ChatOut) -> None:
+    # Produkte nur cachen, wenn sie wirklich von Shopify kamen (kein Fallback wegen Budget/Breaker)
+    if t.cacheable and (t.frag is None or products_fresh(t.frag)):
+        RESPONSE_CACHE.put(t.nq, out, t.frag, t.uses_recipes, (t.m.route, t.m.features.get("intent")))
+    if t.session is not None:
+        SESSIONS.update(t.session, t.m.route, t.m.features.get("intent"), out, t.frag, t.degraded, t.ingredients)
+
+def remember_hit(s: Session, q: str, nq: str, hit: ChatOut) -> None:
+    # Treffer im Antwort-Cache: Route/Intent aus dem Eintrag, Fragment und Zutaten daraus ableiten
+    route, intent = RESPONSE_CACHE.tag(nq)
+    frag = "Gin" if route == "gin_generic" else EDITION_FRAGMENTS.get(intent, intent) if route == "edition" else None
+    SESSIONS.update(s, route, intent, hit, frag, False, parse_ingredients_freeform(q) if route == "custom_cocktail" else None)
+
+def log_turn(nq: str, t0: int, t: Optional[Turn] = None) -> None:
+    # ohne Turn = Treffer im Antwort-Cache; Route/Intent stammen dann aus dem Cache-Eintrag
+    # (Intent nur, wenn das Routing ihn ohnehin berechnet hat – Offtopic/Smalltalk/FAQ brauchen keinen)
+    route, intent = (t.m.route, t.m.features.get("intent")) if t is not None else RESPONSE_CACHE.tag(nq)
+    QUERY_LOG.log({
+        "ts": round(time.time(), 3), "q": nq, "intent": intent, "route": route, "cached": t is None,
+        "degraded": t is not None and t.degraded,
+        "shopify_ms": round(t.shopify_ns / 1e6, 3) if t is not None and t.frag is not None else None,
+        "total_ms": round((_now_ns() - t0) / 1e6, 3),
+    })
+
+async def fetch_products(t: Turn) -> List[Dict[str, Any]]:
+    t0 = _now_ns()
+    items, t.degraded = await shopify_lookup(t.frag)
+    t.shopify_ns = _now_ns() - t0
+    if t.m.route in ("edition","follow_up"): return items or search_fallback(t.frag)
+    return items
+
+def finish_answer(t: Turn, out: Optional[ChatOut], products: List[Dict[str, Any]]) -> ChatOut:
+    # unspezifisch „zeige gin“: der Text hängt vom Ergebnis ab
+    if t.m.route == "gin_generic":
+        if products:
+            return ChatOut(response="Hier sind ein paar Gins aus dem Sortiment:", products=products, suggestions=SUGGESTIONS_DEFAULT)
+        return ChatOut(response="Ich habe nichts Passendes gefunden. Sag z. B. „Zeig Rotkäppchen“.")
+    return out.model_copy(update={"products": [ProductCard(**p) for p in products] if products else None})
+
+def prepare_answer(t: Turn) -> Optional[ChatOut]:
+    # alles, was lokal berechnet wird; braucht die Antwort Produkte, steht das Fragment danach in t.frag
+    # (None = Antwort hängt komplett an Shopify, siehe finish_answer)
+    q, nq = t.q, t.nq
+    m = t.m = ROUTER.classify(nq)
+    route = m.route
+    if t.sw:
+        t.sw.route = route
+        t.sw.lap("route")
+
+    # Folgefrage mit Session-Kontext (Variante, passende Produkte, Foodpairing)
+    if t.session is not None:
+        out = follow_up(t, t.session)
+        if out is not None: return out
 
     # Guard: nur Gin
-    if not is_on_topic(q):
-        return ChatOut(
-            response="Ich helfe ausschließlich zu Gutshof Gin: Produkte, Rezepte, Cocktail-Ideen, Foodpairing, Geschenkideen & FAQs.",
-            suggestions=SUGGESTIONS_DEFAULT
-        )
+    if route == "offtopic":
+        return STATIC_OFFTOPIC
 
     # Smalltalk
-    if any(w in nq for w in ["hallo","hi","servus","hey","moin"]):
-        return ChatOut(
-            response="Servus! Lust auf eine Empfehlung, ein Rezept, Foodpairing oder Geschenkidee?",
-            suggestions=SUGGESTIONS_DEFAULT
-        )
+    if route == "smalltalk":
+        return STATIC_SMALLTALK
 
     # FAQ
-    fa = faq_answer(q)
-    if fa:
-        return ChatOut(response=fa, suggestions=SUGGESTIONS_DEFAULT)
+    if route == "faq":
+        return STATIC_FAQ[m["faq"]]
 
     # Intent (Edition)
-    intent = extract_intent(q)
+    intent = m["intent"]
 
     # --- NEU: Benutzer will frei „Cocktail mit …“ ---
-    if wants_custom_cocktail(nq):
+    if route == "custom_cocktail":
         want_ings = parse_ingredients_freeform(q)
         # Wenn gar nichts extrahiert, bitte lenken.
         if not want_ings:
-            return ChatOut(
-                response="Sag mir Zutaten, z. B.: „Mach mir einen Cocktail mit Limette, Basilikum und Soda.“",
-                suggestions=["Cocktail mit Limette & Basilikum","Drink mit Orange & Campari","Fruchtig: Erdbeere & Soda"]
-            )
-        recipe = generate_cocktail(want_ings, intent)
+            return STATIC_CUSTOM_HELP
+        t.ingredients = want_ings
+        # ohne Seed ist der Name zufällig → nicht cachebar
+        t.cacheable, t.uses_recipes = COCKTAIL_SEEDED, True
+        recipe = generate_cocktail(want_ings, intent, seed=zlib.crc32(nq.encode()) if COCKTAIL_SEEDED else None)
+        # dazu echte Rezepte mit möglichst vielen der genannten Zutaten
+        matches = find_recipes_by_ingredients(want_ings, intent)
+        if INGREDIENT_INDEX.stale: t.cacheable = False    # Neubau läuft noch, Antwort vom alten Stand
         head = "Deine individuelle Cocktail-Idee 🍸"
+        if matches: head += " Dazu passende Rezepte mit deinen Zutaten:"
+        else:
+            # keine Zutat kommt in einem Rezept vor → nach Geschmack
+            matches = similar_recipes(want_ings, intent)
+            if FLAVOR_INDEX.stale: t.cacheable = False
+            if matches: head += " Ähnlich im Geschmack:"
+        if t.sw: t.sw.lap("recipes")
         return ChatOut(
             response=head,
-            recipes=[RecipeCard(**recipe)],
+            recipes=[RecipeCard(**recipe)] + [recipe_card(r) for r in matches],
             suggestions=["Noch eine Variante?","Zeig passende Produkte","Foodpairing"]
         )
 
     # Will explizit „Vorschläge“, „Cocktail Ideen“, „Rezepte“
-    if any(k in nq for k in ["vorschlae","vorschlag","ideen","rezepte","cocktail ideen","cocktailideen","drinks"]):
+    if route == "suggestions":
         # Vorschläge passend zur Edition falls erkannt
-        preferred = intent if intent in CATS else None
-        picks = classic_suggestions(preferred)
-        return ChatOut(
-            response="Hier sind Cocktail-Ideen, die mit unseren Gins super funktionieren:",
-            recipes=[RecipeCard(**{
-                "name": r["name"],
-                "tags": ["klassiker"],
-                "ingredients": r["ingredients"],
-                "instructions": r["instructions"],
-                "gins": r["gins"],
-            }) for r in picks],
-            suggestions=["Mach mir was mit Limette","Foodpairing-Tipp","Zeig Rotkäppchen"]
-        )
-
-    # „Rezept“ erwähnt ohne freie Zutaten → rezepte je Edition zeigen
-    wants_recipe = any(k in nq for k in ["rezept","cocktail","drink","mixen"])
-    wants_pairing = any(k in nq for k in ["pair","food","essen","passt zu","pairing"])
+        return STATIC_SUGGESTIONS[intent if intent in CATS else None]
 
     # unspezifisch „zeige gin“
-    if not intent and any(k in nq for k in ["gin","edition","produkt","produkte","zeigen","zeige","shop"]):
-        prods = shopify_search_by_title("Gin")
-        if prods:
-            return ChatOut(response="Hier sind ein paar Gins aus dem Sortiment:", products=prods, suggestions=SUGGESTIONS_DEFAULT)
-        return ChatOut(response="Ich habe nichts Passendes gefunden. Sag z. B. „Zeig Rotkäppchen“.")    
+    if route == "gin_generic":
+        t.frag = "Gin"
+        return None
 
-    if not intent:
-        return ChatOut(
-            response="Sag mir eine Edition (Rotkäppchen, Froschkönig, Aschenputtel, Sterntaler, Classic, Limetta, Mandarina, Rosata) oder nenn Zutaten für einen Cocktail.",
-            suggestions=["Zeig Classic","Cocktail mit Zitrone & Soda","Foodpairing Rotkäppchen"]
-        )
+    if route == "no_intent":
+        return STATIC_NO_INTENT
+
+    # „Rezept“ erwähnt ohne freie Zutaten → rezepte je Edition zeigen
+    wants_recipe = m["wants_recipe"]
+    wants_pairing = m["wants_pairing"]
 
-    # Produkte
-    products = find_products_for_intent(intent)
+    # Produkte (kommen in finish_answer dazu)
+    t.frag, t.uses_recipes = EDITION_FRAGMENTS.get(intent, intent), True
 
     # Rezepte/Pairings
     recipes = find_recipes_for_intent(intent) if wants_recipe else []
+    if t.sw: t.sw.lap("recipes")
     pairings = PAIRINGS.get(intent) if wants_pairing else None
 
     HEAD = {
@@ -511,19 +2791,11 @@ def chat(body: ChatIn, request: Request):
     # Teaser: wenn kein Rezept angefragt, liefere 1 Klassiker passend zur Edition
     if not recipes:
         cs = classic_suggestions(intent)
-        if cs:
-            recipes = [{
-                "name": cs[0]["name"],
-                "tags": ["klassiker"],
-                "ingredients": cs[0]["ingredients"],
-                "instructions": cs[0]["instructions"],
-                "gins": cs[0]["gins"],
-            }]
+        if cs: recipes = [cs[0]]
 
     return ChatOut(
         response=HEAD,
-        products=[ProductCard(**p) for p in products] if products else None,
-        recipes=[RecipeCard(**r) for r in recipes] if recipes else None,
+        recipes=[recipe_card(r) for r in recipes] if recipes else None,
         pairings=pairings,
         suggestions=SUGGESTIONS_DEFAULT
     )
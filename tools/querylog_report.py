@@ -0,0 +1,172 @@
+# tools/querylog_report.py — Auswertung des Query-Logs (requests.jsonl) im Streaming
+#
+#   python tools/querylog_report.py                        # requests.jsonl + rotierte .1, .2, … (älteste zuerst)
+#   python tools/querylog_report.py log.jsonl --top 30 --json
+#
+# Liest Zeile für Zeile, der Speicher bleibt konstant: Top-Anfragen und Phrasen ohne Intent über
+# Space-Saving (feste Anzahl Zähler, Fehler je Eintrag bekannt), Latenzen über ein logarithmisches
+# Histogramm (Perzentile auf ±2,5 % genau). Zeilen ohne Route (kaputt/fremd) werden nur gezählt.
+
+from __future__ import annotations
+import os, sys, json, math, glob, argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+class SpaceSaving:
+    # Metwally et al.: höchstens `capacity` Zähler; ist alles voll, erbt der Neue den kleinsten Zähler (+1).
+    # Schlüssel liegen in Buckets je Zählerstand → add() ist O(1), auch bei sehr vielen verschiedenen Anfragen
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._buckets: Dict[int, set] = {}
+        self._min = 0
+
+    def _move(self, key: str, old: int, new: int) -> None:
+        if old:
+            b = self._buckets[old]
+            b.discard(key)
+            if not b:
+                del self._buckets[old]
+                if old == self._min: self._min = new
+        self._buckets.setdefault(new, set()).add(key)
+        self.counts[key] = new
+
+    def add(self, key: str) -> None:
+        c = self.counts.get(key)
+        if c is not None:
+            self._move(key, c, c + 1)
+        elif len(self.counts) < self.capacity:
+            self.errors[key] = 0
+            self._move(key, 0, 1)
+            self._min = 1
+        else:
+            low = self._min
+            victim = next(iter(self._buckets[low]))
+            self._buckets[low].discard(victim)
+            del self.counts[victim], self.errors[victim]
+            if not self._buckets[low]:
+                del self._buckets[low]
+                self._min = low + 1
+            self.errors[key] = low
+            self._move(key, 0, low + 1)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        return [(key, n, self.errors[key]) for key, n in sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:k]]
+
+class LogHistogram:
+    # Bucket i deckt [MIN·G^i, MIN·G^(i+1)) ab; Perzentil = geometrische Bucket-Mitte
+    MIN_MS, GROWTH = 0.001, 1.05
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.n, self.total, self.max = 0, 0.0, 0.0
+
+    def add(self, ms: float) -> None:
+        i = -1 if ms < self.MIN_MS else int(math.log(ms / self.MIN_MS, self.GROWTH))
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.n += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.n: return None
+        rank, acc = p / 100 * self.n, 0
+        for i in sorted(self.counts):
+            acc += self.counts[i]
+            if acc >= rank:
+                return 0.0 if i < 0 else min(self.max, self.MIN_MS * self.GROWTH ** (i + 0.5))
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        r = lambda v: None if v is None else round(v, 3)
+        return {"n": self.n, "mean_ms": r(self.total / self.n if self.n else None), "p50_ms": r(self.percentile(50)),
+                "p95_ms": r(self.percentile(95)), "p99_ms": r(self.percentile(99)), "max_ms": r(self.max if self.n else None)}
+
+def default_paths(base: str) -> List[str]:
+    rotated = sorted(glob.glob(base + ".[0-9]*"), key=lambda p: int(p.rsplit(".", 1)[1]) if p.rsplit(".", 1)[1].isdigit() else 0, reverse=True)
+    return rotated + ([base] if os.path.exists(base) else [])
+
+def records(paths: List[str], stats: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    stats["skipped"] += 1
+                    continue
+                if not isinstance(rec, dict) or "route" not in rec:
+                    stats["skipped"] += 1
+                    continue
+                yield rec
+
+def analyze(paths: List[str], capacity: int) -> Dict[str, Any]:
+    stats = {"records": 0, "skipped": 0, "cached": 0, "degraded": 0}
+    queries, unmatched = SpaceSaving(capacity), SpaceSaving(capacity)
+    total, shopify = LogHistogram(), LogHistogram()
+    by_route: Dict[str, LogHistogram] = {}
+    intents: Dict[str, int] = {}
+    first = last = None
+    for rec in records(paths, stats):
+        stats["records"] += 1
+        q, route = rec.get("q") or "", rec["route"]
+        queries.add(q)
+        # Gin-Bezug, aber weder Edition noch Cocktail/FAQ erkannt
+        if route == "no_intent": unmatched.add(q)
+        intents[rec.get("intent") or "-"] = intents.get(rec.get("intent") or "-", 0) + 1
+        stats["cached"] += bool(rec.get("cached"))
+        stats["degraded"] += bool(rec.get("degraded"))
+        if rec.get("total_ms") is not None:
+            total.add(rec["total_ms"])
+            h = by_route.get(route)
+            if h is None: h = by_route[route] = LogHistogram()
+            h.add(rec["total_ms"])
+        if rec.get("shopify_ms") is not None: shopify.add(rec["shopify_ms"])
+        ts = rec.get("ts")
+        if ts is not None:
+            first = ts if first is None else min(first, ts)
+            last = ts if last is None else max(last, ts)
+    return {"files": paths, **stats, "first_ts": first, "last_ts": last,
+            "queries": queries, "unmatched": unmatched, "intents": intents,
+            "latency": {"total": total.summary(), "shopify": shopify.summary(),
+                        "routes": {r: h.summary() for r, h in sorted(by_route.items())}}}
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="*", help="Log-Dateien (Standard: QUERY_LOG_PATH bzw. requests.jsonl samt Rotation)")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--capacity", type=int, default=1000, help="Zähler je Top-Liste (Speichergrenze)")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    paths = args.paths or default_paths(os.getenv("QUERY_LOG_PATH", "requests.jsonl"))
+    if not paths:
+        print("kein Query-Log gefunden", file=sys.stderr)
+        return 1
+    r = analyze(paths, max(args.capacity, args.top))
+    top = [{"q": q, "count": n, "max_overcount": e} for q, n, e in r["queries"].top(args.top)]
+    unmatched = [{"q": q, "count": n, "max_overcount": e} for q, n, e in r["unmatched"].top(args.top)]
+
+    if args.json:
+        out = {k: v for k, v in r.items() if k not in ("queries", "unmatched")}
+        print(json.dumps({**out, "top_queries": top, "unmatched": unmatched}, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{r['records']} Einträge aus {len(paths)} Datei(en), {r['skipped']} übersprungen, "
+          f"{r['cached']} aus dem Antwort-Cache, {r['degraded']} mit Produkt-Fallback")
+    print(f"\nTop {args.top} Anfragen:")
+    for row in top: print(f"  {row['count']:>8}  {row['q']}" + (f"   (±{row['max_overcount']})" if row["max_overcount"] else ""))
+    print(f"\nTop {args.top} ohne Intent (Route no_intent):")
+    for row in unmatched: print(f"  {row['count']:>8}  {row['q']}" + (f"   (±{row['max_overcount']})" if row["max_overcount"] else ""))
+    print("\nIntents:")
+    for intent, n in sorted(r["intents"].items(), key=lambda kv: -kv[1]): print(f"  {n:>8}  {intent}")
+    print(f"\n  {'Latenz (ms)':<18}{'n':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    rows = [("gesamt", r["latency"]["total"]), ("shopify", r["latency"]["shopify"])]
+    rows += [(f"  {k}", v) for k, v in r["latency"]["routes"].items()]
+    fmt = lambda v: f"{v:>10.2f}" if v is not None else f"{'-':>10}"
+    for name, s in rows:
+        print(f"  {name:<18}{s['n']:>8}{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}{fmt(s['max_ms'])}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())